@@ -0,0 +1,168 @@
+"""
+Shared Model Loading for the LLMS Scripts
+This module loads each GPT-2 checkpoint once per process so that VMISPromptEngine
+and LLMEvaluator reuse the same tokenizer files and model weights, and keeps the
+ONNX exports used by the BERT-style models.
+"""
+
+import contextlib
+import functools
+import logging
+import os
+import shutil
+import tempfile
+
+import torch
+from transformers import GPT2LMHeadModel, GPT2Tokenizer
+
+logger = logging.getLogger(__name__)
+
+# ONNX Runtime is optional; without optimum the models run in PyTorch
+try:
+    from optimum import onnxruntime as ort_models
+    ONNX_AVAILABLE = True
+except ImportError:
+    ort_models = None
+    ONNX_AVAILABLE = False
+
+@functools.lru_cache(maxsize=2)
+def load_gpt2(model_name='gpt2'):
+    """Load a GPT-2 tokenizer and model once, returning (tokenizer, model, device, compiled)."""
+    logger.info(f"Loading shared GPT-2 weights: {model_name}")
+    
+    device = 'cuda' if torch.cuda.is_available() else 'cpu'
+    # Half precision halves the weight bandwidth on GPU; CPU stays in fp32
+    dtype = torch.float16 if device == 'cuda' else torch.float32
+    
+    tokenizer = GPT2Tokenizer.from_pretrained(model_name)
+    tokenizer.pad_token = tokenizer.eos_token
+    # safetensors checkpoints are memory-mapped, and low_cpu_mem_usage skips
+    # materialising a randomly initialised model before the weights are copied in
+    model = GPT2LMHeadModel.from_pretrained(
+        model_name,
+        torch_dtype=dtype,
+        low_cpu_mem_usage=True,
+        use_safetensors=True
+    ).to(device).eval()
+    
+    # Compile the forward on GPU; reduce-overhead replays CUDA graphs instead
+    # of launching every kernel from Python
+    compiled = device == 'cuda' and hasattr(torch, 'compile')
+    if compiled:
+        model.forward = torch.compile(model.forward, mode="reduce-overhead", fullgraph=False)
+    
+    return tokenizer, model, device, compiled
+
+@contextlib.contextmanager
+def inference_context(device, dtype=torch.float16):
+    """Disable autograd and autocast to the model's half-precision dtype."""
+    # Autocast keeps reductions such as softmax in fp32; on CPU it only applies to bf16
+    with torch.inference_mode(), torch.autocast(device_type=device, dtype=dtype, enabled=device == 'cuda' or dtype == torch.bfloat16):
+        yield
+
+def to_device(inputs, device):
+    """Move a tensor or tokenizer output to the model device."""
+    if device != 'cuda':
+        return inputs.to(device)
+    # Pinned host memory lets the copy run asynchronously; it is queued on the
+    # same stream as the model, so the forward still sees the finished copy
+    if isinstance(inputs, torch.Tensor):
+        return inputs.pin_memory().to(device, non_blocking=True)
+    return {key: value.pin_memory().to(device, non_blocking=True) for key, value in inputs.items()}
+
+# ONNX exports live beside this module, wherever the scripts are launched from
+ONNX_EXPORT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'onnx')
+
+def _export_onnx(ort_class, model_name, path):
+    """Export a checkpoint into a temporary directory and rename it to path only once complete."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = tempfile.mkdtemp(dir=os.path.dirname(path), prefix=f".{os.path.basename(path)}.")
+    try:
+        ort_class.from_pretrained(model_name, export=True).save_pretrained(tmp)
+        os.replace(tmp, path)
+    except OSError:
+        # Another process finished the same export first; keep that one
+        shutil.rmtree(tmp, ignore_errors=True)
+        if not os.path.isdir(path):
+            raise
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+
+def _write_atomic(path, write):
+    """Produce path by calling write on a temporary path, then renaming it into place."""
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        write(tmp)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+
+def load_onnx_model(ort_class, model_name, export_dir=ONNX_EXPORT_DIR, quantize=True, fusion_type=None):
+    """Load an ONNX Runtime model, exporting the checkpoint on first use."""
+    use_cuda = torch.cuda.is_available()
+    provider = 'CUDAExecutionProvider' if use_cuda else 'CPUExecutionProvider'
+    path = os.path.join(export_dir, model_name.replace('/', '__'))
+    
+    # Every artifact is written under a temporary name and renamed when complete, so an
+    # interrupted run leaves nothing that a later run would mistake for a finished export
+    if not os.path.isdir(path):
+        logger.info(f"Exporting {model_name} to ONNX at {path}")
+        _export_onnx(ort_class, model_name, path)
+    
+    # The offline transformer optimizer fuses attention, LayerNorm and GELU subgraphs
+    # into single contrib ops, which ONNX Runtime's session-time passes do not do;
+    # fusion_type names the optimizer's model type
+    file_name = 'model.onnx'
+    if fusion_type:
+        fused_name = 'model.fused.onnx'
+        if not os.path.exists(os.path.join(path, fused_name)):
+            from onnxruntime.transformers.optimizer import optimize_model
+            logger.info(f"Fusing the ONNX export of {model_name} as {fusion_type}")
+            fused = optimize_model(os.path.join(path, file_name), model_type=fusion_type, use_gpu=use_cuda)
+            _write_atomic(os.path.join(path, fused_name), fused.save_model_to_file)
+        file_name = fused_name
+    
+    # INT8 dynamic quantization lets the CPU MatMuls use VNNI dot products on a
+    # quarter of the weight bytes; the CUDA provider keeps the fp32 graph
+    if quantize and not use_cuda:
+        source_name, file_name = file_name, file_name.replace('.onnx', '.int8.onnx')
+        if not os.path.exists(os.path.join(path, file_name)):
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+            logger.info(f"Quantizing the ONNX export of {model_name} to INT8")
+            _write_atomic(
+                os.path.join(path, file_name),
+                lambda tmp: quantize_dynamic(os.path.join(path, source_name), tmp, weight_type=QuantType.QInt8)
+            )
+    
+    logger.info(f"Loading {file_name} for {model_name} from {path}")
+    return ort_class.from_pretrained(path, file_name=file_name, provider=provider)
+
+def conv1d_to_linear(model):
+    """Replace GPT-2's Conv1D projections with equivalent nn.Linear layers."""
+    from transformers.pytorch_utils import Conv1D
+    for parent in list(model.modules()):
+        for name, child in list(parent.named_children()):
+            if isinstance(child, Conv1D):
+                in_features, out_features = child.weight.shape
+                linear = torch.nn.Linear(in_features, out_features, device=child.weight.device, dtype=child.weight.dtype)
+                linear.weight.data = child.weight.data.t().contiguous()
+                linear.bias.data = child.bias.data
+                setattr(parent, name, linear)
+    return model
+
+def quantize_linear_int8(model):
+    """Quantize a CPU model's Linear layers to INT8."""
+    if torch.cuda.is_available():
+        return model
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+def call_length_sorted(fn, texts):
+    """Call a batched pipeline on texts sorted by length, keeping the input order."""
+    order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+    results = fn([texts[i] for i in order])
+    restored = [None] * len(texts)
+    for position, i in enumerate(order):
+        restored[i] = results[position]
+    return restored
@@ -0,0 +1,77 @@
+"""
+Shared Setup for the LLMS Runner Scripts
+Logging, JSON output and the cached model wrappers used by both main_runner
+and simple_runner. Nothing here imports torch, so a runner can start and
+report a missing package per task instead of failing on import.
+"""
+
+import atexit
+import functools
+import json
+import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
+
+# orjson serialises the results several times faster than the stdlib; fall back to json without it
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+@functools.lru_cache(maxsize=None)
+def setup_logging(log_file='llm_assignment_log.txt'):
+    """Log to the file and the console from a listener thread."""
+    # The task threads only enqueue records, so they never wait on file or console I/O
+    log_queue = queue.SimpleQueue()
+    log_listener = QueueListener(
+        log_queue,
+        logging.FileHandler(log_file),
+        logging.StreamHandler()
+    )
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[QueueHandler(log_queue)],
+        force=True
+    )
+    log_listener.start()
+    # Stopping the listener drains the queue, so buffered lines reach the file on exit
+    atexit.register(log_listener.stop)
+    return log_listener
+
+def dumps_json(obj):
+    """Serialise results as indented UTF-8 JSON bytes, with orjson when it is installed."""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(obj, indent=2, ensure_ascii=False).encode('utf-8')
+
+# Model wrappers are built once per process, so running a task again reuses the
+# loaded weights; the imports stay lazy so a missing package only fails its task
+@functools.lru_cache(maxsize=None)
+def get_text_generator():
+    from text_generation import TextGenerator
+    generator = TextGenerator()
+    # The BERT wrappers warm up in their constructors; GPT-2 generation does it here
+    generator.warmup()
+    return generator
+
+@functools.lru_cache(maxsize=None)
+def get_sentiment_analyzer():
+    from sentiment_analysis import SentimentAnalyzer
+    return SentimentAnalyzer()
+
+@functools.lru_cache(maxsize=None)
+def get_masked_language_model():
+    from masked_language_modeling import MaskedLanguageModel
+    return MaskedLanguageModel()
+
+@functools.lru_cache(maxsize=None)
+def get_evaluator():
+    from evaluation_metrics import LLMEvaluator
+    return LLMEvaluator()
+
+@functools.lru_cache(maxsize=None)
+def get_prompt_engine():
+    from custom_prompts import VMISPromptEngine
+    return VMISPromptEngine()
@@ -3,134 +3,281 @@ Custom Prompts for VMIS - Interview Feedback, Summarization, and Question Genera
 This script demonstrates advanced prompt engineering for specific VMIS use cases.
 """
 
+import copy
+import sys
+import string
+from collections import Counter
 import torch
-from transformers import GPT2LMHeadModel, GPT2Tokenizer
 import logging
 from datetime import datetime
 import json
 
+from _model_cache import inference_context, load_gpt2, to_device
+
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# On GPU, prompt widths are padded to a multiple of this so the captured
+# decode graphs are keyed by a small set of sequence-length buckets
+PROMPT_LENGTH_BUCKET = 64
+
+# Prompts are grouped by token length before generation: at most this many
+# per batch, with the longest no more than this ratio of the shortest
+MAX_BATCH_SIZE = 32
+MAX_LENGTH_RATIO = 1.2
+
+# On GPU, each batch is topped up to the next of these sizes by repeating its
+# last prompt, so the static-cache graphs are keyed by a handful of batch sizes
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32)
+
+# Batch sizes warmed at load time, a single prompt and a full batch, at the first
+# prompt width bucket; other batch sizes, widths and budgets compile on first use
+WARMUP_BATCH_SIZES = (1, MAX_BATCH_SIZE)
+
+# Prompt scaffolding for each VMIS helper: the template filled with the
+# caller's fields, the generation budget, a prefix prepended to the response
+# and the message returned when nothing was generated.
+PROMPT_TEMPLATES = {
+    'feedback': {
+        'template': """
+Interview Performance Analysis:
+Candidate Performance: {performance_description}
+
+Structured Feedback:
+Strengths:""",
+        'max_length': 100,
+        'prefix': "Strengths: ",
+        'fallback': "Unable to generate feedback."
+    },
+    'summary': {
+        'template': """
+Interview Notes: {interview_notes}
+
+Summary:
+Key Strengths:""",
+        'max_length': 120,
+        'prefix': "",
+        'fallback': "Unable to generate summary."
+    },
+    'follow_up': {
+        'template': """
+Previous Response: {previous_response}
+Topic Area: {topic_area}
+
+Follow-up Question:""",
+        'max_length': 80,
+        'prefix': "",
+        'fallback': "Unable to generate follow-up question."
+    },
+    'behavioral': {
+        'template': """
+Competency: {competency}
+
+Behavioral Interview Question:""",
+        'max_length': 60,
+        'prefix': "",
+        'fallback': "Unable to generate behavioral question."
+    },
+    'technical': {
+        'template': """
+Role: {role}
+Difficulty: {difficulty_level}
+
+Technical Assessment Question:""",
+        'max_length': 100,
+        'prefix': "",
+        'fallback': "Unable to generate technical question."
+    },
+    'rating': {
+        'template': """
+Skills Assessment: {skills_assessment}
+
+Performance Rating and Detailed Feedback:
+Rating:""",
+        'max_length': 120,
+        'prefix': "",
+        'fallback': "Unable to generate rating feedback."
+    }
+}
+
+def _split_template(template):
+    """Split a template into (static text, following field name, field has leading space) parts."""
+    parts = []
+    for literal, field_name, _, _ in string.Formatter().parse(template):
+        leading_space = False
+        # Keep the separating space with the field so BPE still produces ' word' tokens
+        if field_name is not None and literal.endswith(' '):
+            literal, leading_space = literal[:-1], True
+        parts.append((literal, field_name, leading_space))
+    return parts
+
+def _length_buckets(input_ids):
+    """Group prompt indices by token length so each batch carries little padding."""
+    order = sorted(range(len(input_ids)), key=lambda i: len(input_ids[i]))
+    
+    buckets = []
+    for i in order:
+        if (buckets
+                and len(buckets[-1]) < MAX_BATCH_SIZE
+                and len(input_ids[i]) <= MAX_LENGTH_RATIO * max(1, len(input_ids[buckets[-1][0]]))):
+            buckets[-1].append(i)
+        else:
+            buckets.append([i])
+    return buckets
+
 class VMISPromptEngine:
     def __init__(self, model_name='gpt2'):
         """Initialize the custom prompt engine for VMIS."""
         logger.info(f"Loading model for custom prompts: {model_name}")
         
-        self.tokenizer = GPT2Tokenizer.from_pretrained(model_name)
-        self.model = GPT2LMHeadModel.from_pretrained(model_name)
-        self.tokenizer.pad_token = self.tokenizer.eos_token
+        # Weights are shared with LLMEvaluator; the tokenizer is copied because
+        # this engine pads on the left
+        tokenizer, self.model, self.device, self.compiled = load_gpt2(model_name)
+        self.tokenizer = copy.copy(tokenizer)
+        # Decoder-only models must be left-padded so every row continues
+        # directly from its own prompt when batched
+        self.tokenizer.padding_side = 'left'
+        
+        # Token ids of every template's static scaffolding, encoded once so
+        # only the caller's field values are tokenized per prompt
+        self._template_parts = {
+            kind: [
+                (self.tokenizer.encode(literal), field_name, leading_space)
+                for literal, field_name, leading_space in _split_template(spec['template'])
+            ]
+            for kind, spec in PROMPT_TEMPLATES.items()
+        }
+        
+        # Pay torch.compile and CUDA graph capture for the warmed shapes now rather than in the first real call
+        if self.compiled:
+            self.warmup()
         
         logger.info("Custom prompt engine loaded successfully!")
     
-    def generate_response(self, prompt, max_length=150, temperature=0.7):
-        """Generate response for a given prompt."""
+    def warmup(self):
+        """Run a small and a large throwaway batch so the most used compiled graphs are ready."""
+        logger.info("Warming up custom prompt engine...")
+        
+        # The static cache is sized by prompt width plus token budget; warm the
+        # budget most templates share
+        max_new_tokens = Counter(spec['max_length'] for spec in PROMPT_TEMPLATES.values()).most_common(1)[0][0]
+        prompt_ids = [self.tokenizer.eos_token_id] * PROMPT_LENGTH_BUCKET
+        for batch_size in WARMUP_BATCH_SIZES:
+            self._generate_padded([prompt_ids] * batch_size, max_new_tokens=max_new_tokens)
+        
+        if self.device == 'cuda':
+            torch.cuda.synchronize()
+    
+    def generate_batch(self, prompts, max_new_tokens=150, temperature=0.7):
+        """Generate responses for a list of prompts with a single padded generate call."""
+        input_ids = [self.tokenizer.encode(prompt) for prompt in prompts]
+        return self.generate_batch_from_ids(input_ids, max_new_tokens=max_new_tokens, temperature=temperature)
+    
+    def generate_batch_from_ids(self, input_ids, max_new_tokens=150, temperature=0.7):
+        """Generate responses for already-tokenized prompts, batching prompts of similar length."""
+        responses = [None] * len(input_ids)
+        
+        for bucket in _length_buckets(input_ids):
+            bucket_responses = self._generate_padded(
+                [input_ids[i] for i in bucket], max_new_tokens=max_new_tokens, temperature=temperature
+            )
+            for i, response in zip(bucket, bucket_responses):
+                responses[i] = response
+        
+        return responses
+    
+    def _generate_padded(self, input_ids, max_new_tokens=150, temperature=0.7):
+        """Generate responses for tokenized prompts with a single padded generate call."""
+        count = len(input_ids)
         try:
-            input_ids = self.tokenizer.encode(prompt, return_tensors='pt')
+            if self.compiled:
+                # The repeated rows only fill the batch out to its size bucket; their output is dropped
+                batch_size = next(size for size in BATCH_SIZE_BUCKETS if size >= count)
+                input_ids = input_ids + [input_ids[-1]] * (batch_size - count)
+            
+            enc = to_device(self.tokenizer.pad(
+                {'input_ids': input_ids},
+                return_tensors='pt',
+                padding=True,
+                pad_to_multiple_of=PROMPT_LENGTH_BUCKET if self.compiled else None
+            ), self.device)
             
-            with torch.no_grad():
+            # use_cache feeds only the newest token plus past_key_values to each
+            # decode step after a single prefill over the prompt. With a compiled
+            # forward the cache is fixed-size so every step replays a CUDA graph.
+            with inference_context(self.device):
                 outputs = self.model.generate(
-                    input_ids,
-                    max_length=len(input_ids[0]) + max_length,
+                    input_ids=enc['input_ids'],
+                    attention_mask=enc['attention_mask'],
+                    max_new_tokens=max_new_tokens,
                     temperature=temperature,
                     do_sample=True,
                     pad_token_id=self.tokenizer.eos_token_id,
                     no_repeat_ngram_size=2,
-                    top_p=0.9
+                    top_p=0.9,
+                    use_cache=True,
+                    cache_implementation="static" if self.compiled else None
                 )
             
-            response = self.tokenizer.decode(outputs[0], skip_special_tokens=True)
-            # Remove the original prompt from the response
-            response = response[len(prompt):].strip()
+            # Left padding aligns every prompt to the same width, so the
+            # generated tokens of each row start at the same offset
+            new_tokens = outputs[:, enc['input_ids'].shape[1]:]
+            responses = self.tokenizer.batch_decode(new_tokens, skip_special_tokens=True)
             
-            return response
+            return [response.strip() for response in responses[:count]]
             
         except Exception as e:
-            logger.error(f"Error generating response: {e}")
-            return "Unable to generate response."
+            logger.error(f"Error generating batch responses: {e}")
+            return ["Unable to generate response."] * count
     
-    def generate_interview_feedback(self, performance_description):
-        """Generate structured feedback for interview performance."""
-        
-        # Template for feedback generation
-        feedback_prompt = f"""
-Interview Performance Analysis:
-Candidate Performance: {performance_description}
-
-Structured Feedback:
-Strengths:"""
+    def generate_response(self, prompt, max_length=150, temperature=0.7):
+        """Generate response for a given prompt."""
+        return self.generate_batch([prompt], max_new_tokens=max_length, temperature=temperature)[0]
+    
+    def run_template_batch(self, kind, fields_list):
+        """Fill a prompt template for every entry and generate in one batch."""
+        spec = PROMPT_TEMPLATES[kind]
+        parts = self._template_parts[kind]
+        input_ids = [self._fill_template_ids(parts, fields) for fields in fields_list]
         
-        response = self.generate_response(feedback_prompt, max_length=100)
+        responses = self.generate_batch_from_ids(input_ids, max_new_tokens=spec['max_length'])
         
-        # Clean up the response
-        if response:
-            return f"Strengths: {response}"
-        return "Unable to generate feedback."
+        return [f"{spec['prefix']}{response}" if response else spec['fallback'] for response in responses]
+    
+    def _fill_template_ids(self, parts, fields):
+        """Assemble prompt token ids from cached scaffold ids and freshly encoded field values."""
+        ids = []
+        for static_ids, field_name, leading_space in parts:
+            ids.extend(static_ids)
+            if field_name is not None:
+                value = str(fields[field_name])
+                ids.extend(self.tokenizer.encode(' ' + value if leading_space else value))
+        return ids
+    
+    def generate_interview_feedback(self, performance_description):
+        """Generate structured feedback for interview performance."""
+        return self.run_template_batch('feedback', [{'performance_description': performance_description}])[0]
     
     def summarize_interview_notes(self, interview_notes):
         """Summarize interview notes into key strengths and weaknesses."""
-        
-        summary_prompt = f"""
-Interview Notes: {interview_notes}
-
-Summary:
-Key Strengths:"""
-        
-        response = self.generate_response(summary_prompt, max_length=120)
-        
-        return response if response else "Unable to generate summary."
+        return self.run_template_batch('summary', [{'interview_notes': interview_notes}])[0]
     
     def create_follow_up_questions(self, previous_response, topic_area):
         """Create follow-up interview questions based on previous responses."""
-        
-        question_prompt = f"""
-Previous Response: {previous_response}
-Topic Area: {topic_area}
-
-Follow-up Question:"""
-        
-        response = self.generate_response(question_prompt, max_length=80)
-        
-        return response if response else "Unable to generate follow-up question."
+        return self.run_template_batch('follow_up', [{'previous_response': previous_response, 'topic_area': topic_area}])[0]
     
     def generate_behavioral_questions(self, competency):
         """Generate behavioral interview questions for specific competencies."""
-        
-        behavioral_prompt = f"""
-Competency: {competency}
-
-Behavioral Interview Question:"""
-        
-        response = self.generate_response(behavioral_prompt, max_length=60)
-        
-        return response if response else "Unable to generate behavioral question."
+        return self.run_template_batch('behavioral', [{'competency': competency}])[0]
     
     def create_technical_assessment(self, role, difficulty_level):
         """Create technical assessment questions for specific roles."""
-        
-        technical_prompt = f"""
-Role: {role}
-Difficulty: {difficulty_level}
-
-Technical Assessment Question:"""
-        
-        response = self.generate_response(technical_prompt, max_length=100)
-        
-        return response if response else "Unable to generate technical question."
+        return self.run_template_batch('technical', [{'role': role, 'difficulty_level': difficulty_level}])[0]
     
     def performance_rating_feedback(self, skills_assessment):
         """Generate performance rating with specific feedback."""
-        
-        rating_prompt = f"""
-Skills Assessment: {skills_assessment}
-
-Performance Rating and Detailed Feedback:
-Rating:"""
-        
-        response = self.generate_response(rating_prompt, max_length=120)
-        
-        return response if response else "Unable to generate rating feedback."
+        return self.run_template_batch('rating', [{'skills_assessment': skills_assessment}])[0]
 
 def main():
     """Demonstrate custom prompt engineering for VMIS."""
@@ -151,11 +298,16 @@ def main():
         "Basic understanding of concepts but struggled with complex problems and team collaboration scenarios."
     ]
     
-    for i, description in enumerate(performance_descriptions, 1):
-        print(f"\nExample {i}:")
-        print(f"Input: {description}")
-        feedback = engine.generate_interview_feedback(description)
-        print(f"Generated Feedback: {feedback}")
+    feedbacks = engine.run_template_batch(
+        'feedback', [{'performance_description': d} for d in performance_descriptions]
+    )
+    
+    lines = []
+    for i, (description, feedback) in enumerate(zip(performance_descriptions, feedbacks), 1):
+        lines.append(f"\nExample {i}:")
+        lines.append(f"Input: {description}")
+        lines.append(f"Generated Feedback: {feedback}")
+    sys.stdout.write("\n".join(lines) + "\n")
     
     print("\n\n2. INTERVIEW SUMMARIZATION")
     print("-" * 45)
@@ -169,10 +321,15 @@ def main():
         "Exceptional leadership qualities and strategic thinking, strong technical foundation, minor areas for development in conflict resolution and stakeholder management."
     ]
     
-    for i, notes in enumerate(interview_notes_samples, 1):
-        print(f"\nInterview Notes {i}: {notes}")
-        summary = engine.summarize_interview_notes(notes)
-        print(f"Summary: {summary}")
+    summaries = engine.run_template_batch(
+        'summary', [{'interview_notes': n} for n in interview_notes_samples]
+    )
+    
+    lines = []
+    for i, (notes, summary) in enumerate(zip(interview_notes_samples, summaries), 1):
+        lines.append(f"\nInterview Notes {i}: {notes}")
+        lines.append(f"Summary: {summary}")
+    sys.stdout.write("\n".join(lines) + "\n")
     
     print("\n\n3. FOLLOW-UP QUESTION GENERATION")
     print("-" * 45)
@@ -197,12 +354,18 @@ def main():
         }
     ]
     
-    for i, scenario in enumerate(follow_up_scenarios, 1):
-        print(f"\nScenario {i}:")
-        print(f"Previous Response: {scenario['response']}")
-        print(f"Topic Area: {scenario['topic']}")
-        follow_up = engine.create_follow_up_questions(scenario['response'], scenario['topic'])
-        print(f"Follow-up Question: {follow_up}")
+    follow_ups = engine.run_template_batch(
+        'follow_up',
+        [{'previous_response': s['response'], 'topic_area': s['topic']} for s in follow_up_scenarios]
+    )
+    
+    lines = []
+    for i, (scenario, follow_up) in enumerate(zip(follow_up_scenarios, follow_ups), 1):
+        lines.append(f"\nScenario {i}:")
+        lines.append(f"Previous Response: {scenario['response']}")
+        lines.append(f"Topic Area: {scenario['topic']}")
+        lines.append(f"Follow-up Question: {follow_up}")
+    sys.stdout.write("\n".join(lines) + "\n")
     
     print("\n\n4. BEHAVIORAL QUESTION GENERATION")
     print("-" * 45)
@@ -216,10 +379,15 @@ def main():
         "Customer Focus and Service Orientation"
     ]
     
-    for competency in competencies:
-        print(f"\nCompetency: {competency}")
-        question = engine.generate_behavioral_questions(competency)
-        print(f"Behavioral Question: {question}")
+    behavioral_questions = engine.run_template_batch(
+        'behavioral', [{'competency': c} for c in competencies]
+    )
+    
+    lines = []
+    for competency, question in zip(competencies, behavioral_questions):
+        lines.append(f"\nCompetency: {competency}")
+        lines.append(f"Behavioral Question: {question}")
+    sys.stdout.write("\n".join(lines) + "\n")
     
     print("\n\n5. TECHNICAL ASSESSMENT GENERATION")
     print("-" * 45)
@@ -233,10 +401,16 @@ def main():
         {'role': 'Machine Learning Engineer', 'difficulty': 'Expert'}
     ]
     
-    for scenario in technical_scenarios:
-        print(f"\nRole: {scenario['role']} | Difficulty: {scenario['difficulty']}")
-        question = engine.create_technical_assessment(scenario['role'], scenario['difficulty'])
-        print(f"Technical Question: {question}")
+    technical_questions = engine.run_template_batch(
+        'technical',
+        [{'role': s['role'], 'difficulty_level': s['difficulty']} for s in technical_scenarios]
+    )
+    
+    lines = []
+    for scenario, question in zip(technical_scenarios, technical_questions):
+        lines.append(f"\nRole: {scenario['role']} | Difficulty: {scenario['difficulty']}")
+        lines.append(f"Technical Question: {question}")
+    sys.stdout.write("\n".join(lines) + "\n")
     
     print("\n\n6. PERFORMANCE RATING WITH DETAILED FEEDBACK")
     print("-" * 45)
@@ -250,10 +424,15 @@ def main():
         "Exceptional technical expertise and innovation, strong analytical skills, requires improvement in mentoring and knowledge sharing"
     ]
     
-    for i, assessment in enumerate(skills_assessments, 1):
-        print(f"\nSkills Assessment {i}: {assessment}")
-        rating_feedback = engine.performance_rating_feedback(assessment)
-        print(f"Rating & Feedback: {rating_feedback}")
+    rating_feedbacks = engine.run_template_batch(
+        'rating', [{'skills_assessment': a} for a in skills_assessments]
+    )
+    
+    lines = []
+    for i, (assessment, rating_feedback) in enumerate(zip(skills_assessments, rating_feedbacks), 1):
+        lines.append(f"\nSkills Assessment {i}: {assessment}")
+        lines.append(f"Rating & Feedback: {rating_feedback}")
+    sys.stdout.write("\n".join(lines) + "\n")
     
     print("\n\n7. VMIS INTEGRATION EXAMPLES")
     print("-" * 45)
@@ -277,9 +456,10 @@ def main():
         }
     ]
     
+    lines = []
     for example in vmis_examples:
-        print(f"\nVMIS Scenario: {example['scenario']}")
-        print(f"Input: {example['input']}")
+        lines.append(f"\nVMIS Scenario: {example['scenario']}")
+        lines.append(f"Input: {example['input']}")
         
         if example['prompt_type'] == 'feedback':
             result = engine.generate_interview_feedback(example['input'])
@@ -288,7 +468,8 @@ def main():
         elif example['prompt_type'] == 'follow_up':
             result = engine.create_follow_up_questions(example['input'], "System Architecture")
         
-        print(f"VMIS Output: {result}")
+        lines.append(f"VMIS Output: {result}")
+    sys.stdout.write("\n".join(lines) + "\n")
 
 if __name__ == "__main__":
     main()
@@ -5,28 +5,69 @@ This script orchestrates all the LLM tasks and generates comprehensive results.
 
 import sys
 import os
-import json
+import asyncio
 import logging
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+import numpy as np
 
-# Import all our custom modules
-from text_generation import TextGenerator
-from sentiment_analysis import SentimentAnalyzer
-from masked_language_modeling import MaskedLanguageModel
-from evaluation_metrics import LLMEvaluator
-from custom_prompts import VMISPromptEngine
+# Import all our custom modules; the model wrappers load on first use
+from _runner_common import (
+    dumps_json, get_evaluator, get_masked_language_model, get_prompt_engine,
+    get_sentiment_analyzer, get_text_generator, setup_logging
+)
 
 # Set up logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('llm_assignment_log.txt'),
-        logging.StreamHandler()
-    ]
-)
+setup_logging()
 logger = logging.getLogger(__name__)
 
+# Task keys in the order they are reported, whatever order they finish in
+TASK_NAMES = ['text_generation', 'sentiment_analysis', 'masked_language_modeling', 'evaluation_metrics', 'custom_prompts']
+
+# Positional arguments for each custom prompt scenario's engine method
+SCENARIO_ARGS = {
+    'feedback': lambda s: (s['input'],),
+    'summary': lambda s: (s['input'],),
+    'follow_up': lambda s: (s['input'], s['topic']),
+    'behavioral': lambda s: (s['input'],),
+    'technical': lambda s: (s['role'], s['difficulty'])
+}
+
+# Per-task detail lines for the summary report of a completed task
+REPORTERS = {
+    'text_generation': lambda r: [
+        f"  Total Generations: {r.get('total_generations', 0)}\n"
+    ],
+    'sentiment_analysis': lambda r: [
+        f"  Total Analyzed: {r.get('total_analyzed', 0)}\n",
+        f"  Average Confidence: {r.get('average_confidence', 0):.3f}\n"
+    ],
+    'masked_language_modeling': lambda r: [
+        f"  Total Predictions: {r.get('total_predictions', 0)}\n"
+    ],
+    'evaluation_metrics': lambda r: [
+        f"  Average BLEU: {r.get('average_metrics', {}).get('average_bleu', 0):.4f}\n",
+        f"  Average ROUGE-1: {r.get('average_metrics', {}).get('average_rouge1', 0):.4f}\n"
+    ],
+    'custom_prompts': lambda r: [
+        f"  Total Prompts: {r.get('total_prompts', 0)}\n",
+        f"  Prompt Types: {', '.join(r.get('prompt_types', []))}\n"
+    ]
+}
+
+def _summarize(results, numeric_fields=(), categorical_fields=(), num_samples=3):
+    """Summarise a task's test cases with counts, means and samples."""
+    n = len(results)
+    summary = {'count': n, 'samples': results[:num_samples]}
+    for field in numeric_fields:
+        values = np.fromiter((r[field] for r in results), dtype=np.float64, count=n)
+        summary[f'avg_{field}'] = float(values.mean()) if n else 0.0
+    for field in categorical_fields:
+        summary[f'dist_{field}'] = dict(Counter(r[field] for r in results))
+    return summary
+
 class LLMAssignmentRunner:
     def __init__(self):
         """Initialize the assignment runner."""
@@ -40,361 +81,402 @@ class LLMAssignmentRunner:
             'custom_prompts': {}
         }
         
-        self.test_cases = []
+        # Test cases are streamed to test_cases.txt in TASK_NAMES order: a finished
+        # task's rendered cases wait only until every earlier task has been written,
+        # and the case dicts themselves are not kept
+        self.test_case_count = 0
+        self._test_case_file = None
+        self._test_case_blocks = {}
+        self._finished_tasks = set()
+        self._next_test_case_task = 0
+        self._test_cases_written = 0
+        self._test_case_lock = threading.Lock()
         self.evaluation_results = []
     
     def run_text_generation_task(self):
         """Run the text generation task."""
         logger.info("Starting Text Generation Task...")
         
+        # Test cases for text generation
+        test_prompts = [
+            "Generate a technical interview question about Python programming:",
+            "Create a behavioral interview question about teamwork:",
+            "Design a problem-solving question for software engineers:",
+            "Generate feedback for excellent interview performance:",
+            "Create a follow-up question about leadership experience:"
+        ]
+        
         try:
-            generator = TextGenerator()
-            
-            # Test cases for text generation
-            test_prompts = [
-                "Generate a technical interview question about Python programming:",
-                "Create a behavioral interview question about teamwork:",
-                "Design a problem-solving question for software engineers:",
-                "Generate feedback for excellent interview performance:",
-                "Create a follow-up question about leadership experience:"
-            ]
-            
-            generation_results = []
-            
-            for prompt in test_prompts:
-                questions = generator.generate_interview_question(prompt, max_length=80)
-                for question in questions:
-                    test_case = {
-                        'task': 'text_generation',
-                        'prompt': prompt,
-                        'generated_output': question,
-                        'timestamp': datetime.now().isoformat()
-                    }
-                    self.test_cases.append(test_case)
-                    generation_results.append(test_case)
-            
-            self.results['text_generation'] = {
-                'status': 'completed',
-                'total_generations': len(generation_results),
-                'sample_outputs': generation_results[:3]  # Store first 3 as samples
-            }
-            
-            self.results['tasks_completed'].append('text_generation')
-            logger.info("Text Generation Task completed successfully!")
-            
+            generator = get_text_generator()
+            batch_questions = generator.generate_batch(test_prompts, max_length=80)
         except Exception as e:
             logger.error(f"Error in text generation task: {e}")
             self.results['text_generation'] = {'status': 'failed', 'error': str(e)}
+            return
+        
+        # One wall-clock capture per batch is enough for test-case bookkeeping
+        timestamp = datetime.now().isoformat()
+        
+        generation_results = [
+            {
+                'task': 'text_generation',
+                'prompt': prompt,
+                'generated_output': question,
+                'timestamp': timestamp
+            }
+            for prompt, questions in zip(test_prompts, batch_questions)
+            for question in questions
+        ]
+        self._record_test_cases(generation_results)
+        
+        summary = _summarize(generation_results)
+        self.results['text_generation'] = {
+            'status': 'completed',
+            'total_generations': summary['count'],
+            'sample_outputs': summary['samples']
+        }
+        
+        self.results['tasks_completed'].append('text_generation')
+        logger.info("Text Generation Task completed successfully!")
     
     def run_sentiment_analysis_task(self):
         """Run the sentiment analysis task."""
         logger.info("Starting Sentiment Analysis Task...")
         
+        # Test feedback samples
+        feedback_samples = [
+            "The candidate demonstrated excellent problem-solving skills and clear communication throughout the interview.",
+            "Poor performance overall, candidate struggled with basic concepts and couldn't answer simple questions.",
+            "Average interview performance, candidate showed some knowledge but lacked depth in technical areas.",
+            "Outstanding candidate! Strong technical background, excellent presentation skills, and great cultural fit.",
+            "The interview was disappointing. Candidate was unprepared and gave vague answers to most questions.",
+            "Solid performance with room for improvement. Good technical skills but needs better communication.",
+            "Exceptional candidate with innovative thinking and strong leadership potential.",
+            "Candidate showed basic understanding but made several critical errors in problem-solving."
+        ]
+        
         try:
-            analyzer = SentimentAnalyzer()
-            
-            # Test feedback samples
-            feedback_samples = [
-                "The candidate demonstrated excellent problem-solving skills and clear communication throughout the interview.",
-                "Poor performance overall, candidate struggled with basic concepts and couldn't answer simple questions.",
-                "Average interview performance, candidate showed some knowledge but lacked depth in technical areas.",
-                "Outstanding candidate! Strong technical background, excellent presentation skills, and great cultural fit.",
-                "The interview was disappointing. Candidate was unprepared and gave vague answers to most questions.",
-                "Solid performance with room for improvement. Good technical skills but needs better communication.",
-                "Exceptional candidate with innovative thinking and strong leadership potential.",
-                "Candidate showed basic understanding but made several critical errors in problem-solving."
-            ]
-            
-            sentiment_results = []
-            
-            for feedback in feedback_samples:
-                result = analyzer.classify_interview_performance(feedback)
-                test_case = {
-                    'task': 'sentiment_analysis',
-                    'input_feedback': feedback,
-                    'sentiment': result['sentiment'],
-                    'performance_rating': result['performance_rating'],
-                    'confidence': result['confidence'],
-                    'timestamp': datetime.now().isoformat()
-                }
-                self.test_cases.append(test_case)
-                sentiment_results.append(test_case)
-            
-            # Calculate distribution
-            sentiment_counts = {}
-            total_confidence = 0
-            
-            for result in sentiment_results:
-                sentiment = result['sentiment']
-                sentiment_counts[sentiment] = sentiment_counts.get(sentiment, 0) + 1
-                total_confidence += result['confidence']
-            
-            self.results['sentiment_analysis'] = {
-                'status': 'completed',
-                'total_analyzed': len(sentiment_results),
-                'sentiment_distribution': sentiment_counts,
-                'average_confidence': total_confidence / len(sentiment_results),
-                'sample_results': sentiment_results[:3]
-            }
-            
-            self.results['tasks_completed'].append('sentiment_analysis')
-            logger.info("Sentiment Analysis Task completed successfully!")
-            
+            analyzer = get_sentiment_analyzer()
+            classifications = analyzer.classify_batch(feedback_samples)
         except Exception as e:
             logger.error(f"Error in sentiment analysis task: {e}")
             self.results['sentiment_analysis'] = {'status': 'failed', 'error': str(e)}
+            return
+        
+        timestamp = datetime.now().isoformat()
+        
+        sentiment_results = [
+            {
+                'task': 'sentiment_analysis',
+                'input_feedback': result['feedback'],
+                'sentiment': result['sentiment'],
+                'performance_rating': result['performance_rating'],
+                'confidence': result['confidence'],
+                'timestamp': timestamp
+            }
+            for result in classifications
+        ]
+        self._record_test_cases(sentiment_results)
+        
+        # Calculate distribution
+        summary = _summarize(sentiment_results, numeric_fields=('confidence',), categorical_fields=('sentiment',))
+        self.results['sentiment_analysis'] = {
+            'status': 'completed',
+            'total_analyzed': summary['count'],
+            'sentiment_distribution': summary['dist_sentiment'],
+            'average_confidence': summary['avg_confidence'],
+            'sample_results': summary['samples']
+        }
+        
+        self.results['tasks_completed'].append('sentiment_analysis')
+        logger.info("Sentiment Analysis Task completed successfully!")
     
     def run_masked_language_modeling_task(self):
         """Run the masked language modeling task."""
         logger.info("Starting Masked Language Modeling Task...")
         
+        # Test sentences with masks
+        masked_sentences = [
+            "The candidate demonstrated excellent [MASK] skills during the interview.",
+            "The interview went [MASK] and we were impressed with their performance.",
+            "We need to [MASK] the candidate's technical abilities before making a decision.",
+            "The candidate's [MASK] to complex problems was outstanding.",
+            "During the [MASK] process, we evaluate both technical and soft skills.",
+            "The applicant showed great [MASK] when solving the coding challenge.",
+            "Her [MASK] skills impressed the entire interview panel.",
+            "The final [MASK] will be with the hiring manager next week."
+        ]
+        
         try:
-            mlm = MaskedLanguageModel()
-            
-            # Test sentences with masks
-            masked_sentences = [
-                "The candidate demonstrated excellent [MASK] skills during the interview.",
-                "The interview went [MASK] and we were impressed with their performance.",
-                "We need to [MASK] the candidate's technical abilities before making a decision.",
-                "The candidate's [MASK] to complex problems was outstanding.",
-                "During the [MASK] process, we evaluate both technical and soft skills.",
-                "The applicant showed great [MASK] when solving the coding challenge.",
-                "Her [MASK] skills impressed the entire interview panel.",
-                "The final [MASK] will be with the hiring manager next week."
-            ]
-            
-            mlm_results = []
-            
-            for sentence in masked_sentences:
-                predictions = mlm.predict_masked_word(sentence, top_k=3)
-                test_case = {
-                    'task': 'masked_language_modeling',
-                    'masked_sentence': sentence,
-                    'predictions': predictions[:3],  # Top 3 predictions
-                    'timestamp': datetime.now().isoformat()
-                }
-                self.test_cases.append(test_case)
-                mlm_results.append(test_case)
-            
-            self.results['masked_language_modeling'] = {
-                'status': 'completed',
-                'total_predictions': len(mlm_results),
-                'sample_results': mlm_results[:3]
-            }
-            
-            self.results['tasks_completed'].append('masked_language_modeling')
-            logger.info("Masked Language Modeling Task completed successfully!")
-            
+            mlm = get_masked_language_model()
+            prepared = mlm.prepare(masked_sentences)
+            batch_predictions = mlm.predict_masked_batch(masked_sentences, top_k=3, prepared=prepared)
         except Exception as e:
             logger.error(f"Error in masked language modeling task: {e}")
             self.results['masked_language_modeling'] = {'status': 'failed', 'error': str(e)}
+            return
+        
+        timestamp = datetime.now().isoformat()
+        
+        mlm_results = [
+            {
+                'task': 'masked_language_modeling',
+                'masked_sentence': sentence,
+                'predictions': predictions[:3],  # Top 3 predictions
+                'timestamp': timestamp
+            }
+            for sentence, predictions in zip(masked_sentences, batch_predictions)
+        ]
+        self._record_test_cases(mlm_results)
+        
+        summary = _summarize(mlm_results)
+        self.results['masked_language_modeling'] = {
+            'status': 'completed',
+            'total_predictions': summary['count'],
+            'sample_results': summary['samples']
+        }
+        
+        self.results['tasks_completed'].append('masked_language_modeling')
+        logger.info("Masked Language Modeling Task completed successfully!")
     
     def run_evaluation_metrics_task(self):
         """Run the evaluation metrics task."""
         logger.info("Starting Evaluation Metrics Task...")
         
+        # Sample evaluation data
+        evaluation_data = [
+            {
+                'prompt': "Generate feedback for excellent performance:",
+                'reference': "Outstanding performance! The candidate demonstrated exceptional technical skills and clear communication.",
+                'generated': "Excellent work! The candidate showed strong technical abilities and communicated very well."
+            },
+            {
+                'prompt': "Create a follow-up question about teamwork:",
+                'reference': "Can you describe a time when you had to work with a difficult team member and how you handled it?",
+                'generated': "Tell me about a challenging team situation you faced and how you resolved it."
+            },
+            {
+                'prompt': "Summarize interview strengths and weaknesses:",
+                'reference': "Strengths: Strong technical background, good problem-solving. Weaknesses: Needs improvement in communication skills.",
+                'generated': "Strengths: Solid technical knowledge, analytical thinking. Areas for improvement: Communication and presentation."
+            },
+            {
+                'prompt': "Generate a coding interview question:",
+                'reference': "Write a function to find the longest substring without repeating characters in a given string.",
+                'generated': "Implement a method to determine the longest substring with unique characters from an input string."
+            },
+            {
+                'prompt': "Create behavioral interview feedback:",
+                'reference': "The candidate showed good leadership potential but needs more experience in conflict resolution.",
+                'generated': "Strong leadership qualities demonstrated, however requires development in handling team conflicts."
+            }
+        ]
+        
         try:
-            evaluator = LLMEvaluator()
-            
-            # Sample evaluation data
-            evaluation_data = [
-                {
-                    'prompt': "Generate feedback for excellent performance:",
-                    'reference': "Outstanding performance! The candidate demonstrated exceptional technical skills and clear communication.",
-                    'generated': "Excellent work! The candidate showed strong technical abilities and communicated very well."
-                },
-                {
-                    'prompt': "Create a follow-up question about teamwork:",
-                    'reference': "Can you describe a time when you had to work with a difficult team member and how you handled it?",
-                    'generated': "Tell me about a challenging team situation you faced and how you resolved it."
-                },
-                {
-                    'prompt': "Summarize interview strengths and weaknesses:",
-                    'reference': "Strengths: Strong technical background, good problem-solving. Weaknesses: Needs improvement in communication skills.",
-                    'generated': "Strengths: Solid technical knowledge, analytical thinking. Areas for improvement: Communication and presentation."
-                },
-                {
-                    'prompt': "Generate a coding interview question:",
-                    'reference': "Write a function to find the longest substring without repeating characters in a given string.",
-                    'generated': "Implement a method to determine the longest substring with unique characters from an input string."
-                },
-                {
-                    'prompt': "Create behavioral interview feedback:",
-                    'reference': "The candidate showed good leadership potential but needs more experience in conflict resolution.",
-                    'generated': "Strong leadership qualities demonstrated, however requires development in handling team conflicts."
-                }
-            ]
-            
+            evaluator = get_evaluator()
             results, avg_metrics = evaluator.batch_evaluation(evaluation_data)
-            
-            # Store evaluation results
-            for result in results:
-                eval_case = {
-                    'task': 'evaluation_metrics',
-                    'prompt': result['prompt'],
-                    'reference': result['reference'],
-                    'generated': result['generated'],
-                    'bleu_score': result['bleu_score'],
-                    'rouge_scores': result['rouge_scores'],
-                    'perplexity': result['perplexity'],
-                    'timestamp': result['timestamp']
-                }
-                self.evaluation_results.append(eval_case)
-            
-            self.results['evaluation_metrics'] = {
-                'status': 'completed',
-                'average_metrics': avg_metrics,
-                'individual_results': results[:3]  # Store first 3 as samples
-            }
-            
-            self.results['tasks_completed'].append('evaluation_metrics')
-            logger.info("Evaluation Metrics Task completed successfully!")
-            
         except Exception as e:
             logger.error(f"Error in evaluation metrics task: {e}")
             self.results['evaluation_metrics'] = {'status': 'failed', 'error': str(e)}
+            return
+        
+        # Store evaluation results
+        self.evaluation_results.extend(
+            {
+                'task': 'evaluation_metrics',
+                'prompt': result['prompt'],
+                'reference': result['reference'],
+                'generated': result['generated'],
+                'bleu_score': result['bleu_score'],
+                'rouge_scores': result['rouge_scores'],
+                'perplexity': result['perplexity'],
+                'timestamp': result['timestamp']
+            }
+            for result in results
+        )
+        
+        self.results['evaluation_metrics'] = {
+            'status': 'completed',
+            'average_metrics': avg_metrics,
+            'individual_results': results[:3]  # Store first 3 as samples
+        }
+        
+        self.results['tasks_completed'].append('evaluation_metrics')
+        logger.info("Evaluation Metrics Task completed successfully!")
     
     def run_custom_prompts_task(self):
         """Run the custom prompts task."""
         logger.info("Starting Custom Prompts Task...")
         
-        try:
-            engine = VMISPromptEngine()
-            
-            # Test custom prompt scenarios
-            custom_scenarios = [
-                {
-                    'type': 'feedback',
-                    'input': 'The candidate demonstrates strong analytical skills but lacks communication abilities.',
-                    'method': 'generate_interview_feedback'
-                },
-                {
-                    'type': 'summary',
-                    'input': 'Candidate answered technical questions well, showed good coding skills, but was nervous during presentation',
-                    'method': 'summarize_interview_notes'
-                },
-                {
-                    'type': 'follow_up',
-                    'input': 'I used Python and machine learning to solve the problem',
-                    'topic': 'Technical Implementation',
-                    'method': 'create_follow_up_questions'
-                },
-                {
-                    'type': 'behavioral',
-                    'input': 'Leadership and Team Management',
-                    'method': 'generate_behavioral_questions'
-                },
-                {
-                    'type': 'technical',
-                    'role': 'Software Engineer',
-                    'difficulty': 'Intermediate',
-                    'method': 'create_technical_assessment'
-                }
-            ]
-            
-            custom_results = []
-            
-            for scenario in custom_scenarios:
-                if scenario['type'] == 'feedback':
-                    output = engine.generate_interview_feedback(scenario['input'])
-                elif scenario['type'] == 'summary':
-                    output = engine.summarize_interview_notes(scenario['input'])
-                elif scenario['type'] == 'follow_up':
-                    output = engine.create_follow_up_questions(scenario['input'], scenario['topic'])
-                elif scenario['type'] == 'behavioral':
-                    output = engine.generate_behavioral_questions(scenario['input'])
-                elif scenario['type'] == 'technical':
-                    output = engine.create_technical_assessment(scenario['role'], scenario['difficulty'])
-                
-                test_case = {
-                    'task': 'custom_prompts',
-                    'prompt_type': scenario['type'],
-                    'input': scenario.get('input', ''),
-                    'generated_output': output,
-                    'timestamp': datetime.now().isoformat()
-                }
-                self.test_cases.append(test_case)
-                custom_results.append(test_case)
-            
-            self.results['custom_prompts'] = {
-                'status': 'completed',
-                'total_prompts': len(custom_results),
-                'prompt_types': list(set([r['prompt_type'] for r in custom_results])),
-                'sample_results': custom_results[:3]
+        # Test custom prompt scenarios
+        custom_scenarios = [
+            {
+                'type': 'feedback',
+                'input': 'The candidate demonstrates strong analytical skills but lacks communication abilities.',
+                'method': 'generate_interview_feedback'
+            },
+            {
+                'type': 'summary',
+                'input': 'Candidate answered technical questions well, showed good coding skills, but was nervous during presentation',
+                'method': 'summarize_interview_notes'
+            },
+            {
+                'type': 'follow_up',
+                'input': 'I used Python and machine learning to solve the problem',
+                'topic': 'Technical Implementation',
+                'method': 'create_follow_up_questions'
+            },
+            {
+                'type': 'behavioral',
+                'input': 'Leadership and Team Management',
+                'method': 'generate_behavioral_questions'
+            },
+            {
+                'type': 'technical',
+                'role': 'Software Engineer',
+                'difficulty': 'Intermediate',
+                'method': 'create_technical_assessment'
             }
-            
-            self.results['tasks_completed'].append('custom_prompts')
-            logger.info("Custom Prompts Task completed successfully!")
-            
+        ]
+        
+        try:
+            engine = get_prompt_engine()
+            outputs = [None] * len(custom_scenarios)
+            for i, scenario in enumerate(custom_scenarios):
+                method = getattr(engine, scenario['method'])
+                outputs[i] = method(*SCENARIO_ARGS[scenario['type']](scenario))
         except Exception as e:
             logger.error(f"Error in custom prompts task: {e}")
             self.results['custom_prompts'] = {'status': 'failed', 'error': str(e)}
+            return
+        
+        timestamp = datetime.now().isoformat()
+        
+        custom_results = [
+            {
+                'task': 'custom_prompts',
+                'prompt_type': scenario['type'],
+                'input': scenario.get('input', ''),
+                'generated_output': output,
+                'timestamp': timestamp
+            }
+            for scenario, output in zip(custom_scenarios, outputs)
+        ]
+        self._record_test_cases(custom_results)
+        
+        summary = _summarize(custom_results, categorical_fields=('prompt_type',))
+        self.results['custom_prompts'] = {
+            'status': 'completed',
+            'total_prompts': summary['count'],
+            'prompt_types': list(summary['dist_prompt_type']),
+            'sample_results': summary['samples']
+        }
+        
+        self.results['tasks_completed'].append('custom_prompts')
+        logger.info("Custom Prompts Task completed successfully!")
+    
+    def _record_test_cases(self, cases):
+        """Render a task's test cases and hold them until the task's turn in test_cases.txt."""
+        rendered = [self._format_test_case(case) for case in cases]
+        with self._test_case_lock:
+            for case, block in zip(cases, rendered):
+                self._test_case_blocks.setdefault(case['task'], []).append(block)
+            self.test_case_count += len(cases)
+    
+    def _finish_test_cases(self, task):
+        """Mark a task finished and append every held task that is now next in TASK_NAMES order."""
+        with self._test_case_lock:
+            self._finished_tasks.add(task)
+            f = self._open_test_case_file()
+            while self._next_test_case_task < len(TASK_NAMES) and TASK_NAMES[self._next_test_case_task] in self._finished_tasks:
+                blocks = self._test_case_blocks.pop(TASK_NAMES[self._next_test_case_task], [])
+                f.write(''.join(f"Test Case {i}:\n{block}" for i, block in enumerate(blocks, self._test_cases_written + 1)))
+                self._test_cases_written += len(blocks)
+                self._next_test_case_task += 1
+    
+    def _open_test_case_file(self):
+        """Open test_cases.txt with a large write buffer and write its header on first use."""
+        if self._test_case_file is None:
+            self._test_case_file = open('test_cases.txt', 'w', encoding='utf-8', buffering=1 << 20)
+            self._test_case_file.write("LLM Assignment Test Cases\n" + "=" * 50 + "\n\n")
+        return self._test_case_file
+    
+    def _close_test_case_file(self):
+        """Write any cases still held, then flush and close test_cases.txt."""
+        # Tasks that never ran count as finished, so nothing recorded is left behind
+        for task in TASK_NAMES:
+            self._finish_test_cases(task)
+        with self._test_case_lock:
+            self._test_case_file.close()
+            self._test_case_file = None
+    
+    def _format_test_case(self, case):
+        """Render one test case as a test_cases.txt block."""
+        lines = [
+            f"Task: {case['task']}\n",
+            f"Timestamp: {case['timestamp']}\n"
+        ]
+        
+        if 'prompt' in case:
+            lines.append(f"Prompt: {case['prompt']}\n")
+        if 'input_feedback' in case:
+            lines.append(f"Input: {case['input_feedback']}\n")
+        if 'masked_sentence' in case:
+            lines.append(f"Masked Sentence: {case['masked_sentence']}\n")
+        if 'generated_output' in case:
+            lines.append(f"Output: {case['generated_output']}\n")
+        if 'sentiment' in case:
+            lines.append(f"Sentiment: {case['sentiment']} (Confidence: {case['confidence']:.3f})\n")
+        if 'predictions' in case:
+            lines.append("Predictions:\n")
+            for pred in case['predictions']:
+                lines.append(f"  - {pred['predicted_word']} (confidence: {pred['confidence']:.3f})\n")
+        
+        lines.append("\n" + "-" * 30 + "\n\n")
+        return ''.join(lines)
     
     def save_results(self):
         """Save all results to files."""
         logger.info("Saving results to files...")
         
         try:
-            # Save test cases
-            with open('test_cases.txt', 'w', encoding='utf-8') as f:
-                f.write("LLM Assignment Test Cases\n")
-                f.write("=" * 50 + "\n\n")
-                
-                for i, case in enumerate(self.test_cases, 1):
-                    f.write(f"Test Case {i}:\n")
-                    f.write(f"Task: {case['task']}\n")
-                    f.write(f"Timestamp: {case['timestamp']}\n")
-                    
-                    if 'prompt' in case:
-                        f.write(f"Prompt: {case['prompt']}\n")
-                    if 'input_feedback' in case:
-                        f.write(f"Input: {case['input_feedback']}\n")
-                    if 'masked_sentence' in case:
-                        f.write(f"Masked Sentence: {case['masked_sentence']}\n")
-                    if 'generated_output' in case:
-                        f.write(f"Output: {case['generated_output']}\n")
-                    if 'sentiment' in case:
-                        f.write(f"Sentiment: {case['sentiment']} (Confidence: {case['confidence']:.3f})\n")
-                    if 'predictions' in case:
-                        f.write("Predictions:\n")
-                        for pred in case['predictions']:
-                            f.write(f"  - {pred['predicted_word']} (confidence: {pred['confidence']:.3f})\n")
-                    
-                    f.write("\n" + "-" * 30 + "\n\n")
+            # Test cases were streamed as the tasks finished; close the file to flush them
+            self._close_test_case_file()
+            
+            # Save evaluation results; the text is collected first and written in one call
+            lines = ["LLM Evaluation Results\n", "=" * 50 + "\n\n"]
+            
+            if self.results['evaluation_metrics']['status'] == 'completed':
+                avg_metrics = self.results['evaluation_metrics']['average_metrics']
+                lines.append("AVERAGE METRICS:\n")
+                lines.append(f"Average Perplexity: {avg_metrics['average_perplexity']:.2f}\n")
+                lines.append(f"Average BLEU Score: {avg_metrics['average_bleu']:.4f}\n")
+                lines.append(f"Average ROUGE-1: {avg_metrics['average_rouge1']:.4f}\n")
+                lines.append(f"Average ROUGE-2: {avg_metrics['average_rouge2']:.4f}\n")
+                lines.append(f"Average ROUGE-L: {avg_metrics['average_rougeL']:.4f}\n")
+                lines.append(f"Total Samples: {avg_metrics['total_samples']}\n\n")
+            
+            lines.append("INDIVIDUAL RESULTS:\n")
+            lines.append("-" * 30 + "\n")
+            
+            for i, result in enumerate(self.evaluation_results, 1):
+                lines.append(f"\nEvaluation {i}:\n")
+                lines.append(f"Prompt: {result['prompt']}\n")
+                lines.append(f"Reference: {result['reference']}\n")
+                lines.append(f"Generated: {result['generated']}\n")
+                lines.append(f"BLEU Score: {result['bleu_score']:.4f}\n")
+                lines.append(f"ROUGE-1: {result['rouge_scores']['rouge1']:.4f}\n")
+                lines.append(f"ROUGE-2: {result['rouge_scores']['rouge2']:.4f}\n")
+                lines.append(f"ROUGE-L: {result['rouge_scores']['rougeL']:.4f}\n")
+                lines.append(f"Perplexity: {result['perplexity']:.2f}\n")
+                lines.append("-" * 20 + "\n")
             
-            # Save evaluation results
             with open('evaluation_results.txt', 'w', encoding='utf-8') as f:
-                f.write("LLM Evaluation Results\n")
-                f.write("=" * 50 + "\n\n")
-                
-                if self.results['evaluation_metrics']['status'] == 'completed':
-                    avg_metrics = self.results['evaluation_metrics']['average_metrics']
-                    f.write("AVERAGE METRICS:\n")
-                    f.write(f"Average Perplexity: {avg_metrics['average_perplexity']:.2f}\n")
-                    f.write(f"Average BLEU Score: {avg_metrics['average_bleu']:.4f}\n")
-                    f.write(f"Average ROUGE-1: {avg_metrics['average_rouge1']:.4f}\n")
-                    f.write(f"Average ROUGE-2: {avg_metrics['average_rouge2']:.4f}\n")
-                    f.write(f"Average ROUGE-L: {avg_metrics['average_rougeL']:.4f}\n")
-                    f.write(f"Total Samples: {avg_metrics['total_samples']}\n\n")
-                
-                f.write("INDIVIDUAL RESULTS:\n")
-                f.write("-" * 30 + "\n")
-                
-                for i, result in enumerate(self.evaluation_results, 1):
-                    f.write(f"\nEvaluation {i}:\n")
-                    f.write(f"Prompt: {result['prompt']}\n")
-                    f.write(f"Reference: {result['reference']}\n")
-                    f.write(f"Generated: {result['generated']}\n")
-                    f.write(f"BLEU Score: {result['bleu_score']:.4f}\n")
-                    f.write(f"ROUGE-1: {result['rouge_scores']['rouge1']:.4f}\n")
-                    f.write(f"ROUGE-2: {result['rouge_scores']['rouge2']:.4f}\n")
-                    f.write(f"ROUGE-L: {result['rouge_scores']['rougeL']:.4f}\n")
-                    f.write(f"Perplexity: {result['perplexity']:.2f}\n")
-                    f.write("-" * 20 + "\n")
+                f.write(''.join(lines))
             
             # Save comprehensive results as JSON
-            with open('comprehensive_results.json', 'w', encoding='utf-8') as f:
-                json.dump(self.results, f, indent=2, ensure_ascii=False)
+            with open('comprehensive_results.json', 'wb') as f:
+                f.write(dumps_json(self.results))
             
             logger.info("Results saved successfully!")
             
@@ -405,64 +487,58 @@ class LLMAssignmentRunner:
         """Generate a summary report."""
         logger.info("Generating summary report...")
         
+        completed = self.results['tasks_completed']
+        lines = [
+            "LLM Assignment Summary Report\n",
+            "=" * 50 + "\n\n",
+            f"Execution Date: {self.results['timestamp']}\n",
+            f"Tasks Completed: {len(completed)}/5\n",
+            f"Completed Tasks: {', '.join(completed)}\n\n",
+            "TASK DETAILS:\n",
+            "-" * 20 + "\n\n"
+        ]
+        
+        for task in TASK_NAMES:
+            task_result = self.results.get(task, {})
+            status = task_result.get('status')
+            lines.append(f"{task.replace('_', ' ').title()}:\n")
+            lines.append(f"  Status: {status or 'Not executed'}\n")
+            if status == 'completed':
+                lines.extend(REPORTERS[task](task_result))
+            lines.append("\n")
+        
+        lines.append(f"Total Test Cases Generated: {self.test_case_count}\n")
+        lines.append(f"Total Evaluation Results: {len(self.evaluation_results)}\n")
+        
         with open('assignment_summary.txt', 'w', encoding='utf-8') as f:
-            f.write("LLM Assignment Summary Report\n")
-            f.write("=" * 50 + "\n\n")
-            f.write(f"Execution Date: {self.results['timestamp']}\n")
-            f.write(f"Tasks Completed: {len(self.results['tasks_completed'])}/5\n")
-            f.write(f"Completed Tasks: {', '.join(self.results['tasks_completed'])}\n\n")
-            
-            f.write("TASK DETAILS:\n")
-            f.write("-" * 20 + "\n\n")
-            
-            for task in ['text_generation', 'sentiment_analysis', 'masked_language_modeling', 'evaluation_metrics', 'custom_prompts']:
-                task_result = self.results.get(task, {})
-                f.write(f"{task.replace('_', ' ').title()}:\n")
-                f.write(f"  Status: {task_result.get('status', 'Not executed')}\n")
-                
-                if task_result.get('status') == 'completed':
-                    if task == 'text_generation':
-                        f.write(f"  Total Generations: {task_result.get('total_generations', 0)}\n")
-                    elif task == 'sentiment_analysis':
-                        f.write(f"  Total Analyzed: {task_result.get('total_analyzed', 0)}\n")
-                        f.write(f"  Average Confidence: {task_result.get('average_confidence', 0):.3f}\n")
-                    elif task == 'masked_language_modeling':
-                        f.write(f"  Total Predictions: {task_result.get('total_predictions', 0)}\n")
-                    elif task == 'evaluation_metrics':
-                        avg_metrics = task_result.get('average_metrics', {})
-                        f.write(f"  Average BLEU: {avg_metrics.get('average_bleu', 0):.4f}\n")
-                        f.write(f"  Average ROUGE-1: {avg_metrics.get('average_rouge1', 0):.4f}\n")
-                    elif task == 'custom_prompts':
-                        f.write(f"  Total Prompts: {task_result.get('total_prompts', 0)}\n")
-                        f.write(f"  Prompt Types: {', '.join(task_result.get('prompt_types', []))}\n")
-                
-                f.write("\n")
-            
-            f.write(f"Total Test Cases Generated: {len(self.test_cases)}\n")
-            f.write(f"Total Evaluation Results: {len(self.evaluation_results)}\n")
+            f.write(''.join(lines))
     
     def run_all_tasks(self):
         """Run all LLM assignment tasks."""
         logger.info("Starting LLM Assignment Runner...")
         
-        tasks = [
-            self.run_text_generation_task,
-            self.run_sentiment_analysis_task,
-            self.run_masked_language_modeling_task,
-            self.run_evaluation_metrics_task,
-            self.run_custom_prompts_task
+        # Each group runs on its own worker thread, so one group's tokenization and
+        # bookkeeping overlaps with another's model calls. The evaluation and custom
+        # prompt tasks share the GPT-2 module from load_gpt2, whose compiled forward
+        # and static cache must not be called from two threads at once, so they run
+        # one after the other in the same group
+        task_groups = [
+            [self.run_text_generation_task],
+            [self.run_sentiment_analysis_task],
+            [self.run_masked_language_modeling_task],
+            [self.run_evaluation_metrics_task, self.run_custom_prompts_task]
         ]
+        asyncio.run(self._run_tasks_concurrently(task_groups))
         
-        for task in tasks:
-            try:
-                task()
-            except Exception as e:
-                logger.error(f"Error in task {task.__name__}: {e}")
-                continue
+        # Restore the fixed task order, whatever order the tasks finished in
+        self.results['tasks_completed'].sort(key=TASK_NAMES.index)
         
-        # Save all results
-        self.save_results()
-        self.generate_summary_report()
+        # Save all results; both writers only read the results, so they run side by side
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            executor.submit(self.save_results)
+            summary = executor.submit(self.generate_summary_report)
+        # save_results logs its own errors; surface any from the summary report
+        summary.result()
         
         logger.info("LLM Assignment completed!")
         logger.info(f"Tasks completed: {len(self.results['tasks_completed'])}/5")
@@ -472,6 +548,21 @@ class LLMAssignmentRunner:
         logger.info("  - comprehensive_results.json")
         logger.info("  - assignment_summary.txt")
         logger.info("  - llm_assignment_log.txt")
+    
+    async def _run_tasks_concurrently(self, task_groups):
+        """Run each group of tasks on its own worker thread."""
+        await asyncio.gather(*(asyncio.to_thread(self._run_task_group, tasks) for tasks in task_groups))
+    
+    def _run_task_group(self, tasks):
+        """Run task methods in order, logging errors."""
+        for task in tasks:
+            try:
+                task()
+            except Exception as e:
+                logger.error(f"Error in task {task.__name__}: {e}")
+            finally:
+                # run_<name>_task -> <name>; lets test_cases.txt move past this task
+                self._finish_test_cases(task.__name__.removeprefix('run_').removesuffix('_task'))
 
 def main():
     """Main function to run the LLM assignment."""
@@ -3,95 +3,234 @@ Masked Language Modeling using BERT
 This script demonstrates BERT's ability to predict missing words in sentences.
 """
 
+import functools
+import itertools
+import sys
 import torch
 from transformers import AutoTokenizer, AutoModelForMaskedLM
 from transformers import pipeline
 import logging
+from _model_cache import ONNX_AVAILABLE, call_length_sorted, inference_context, load_onnx_model, ort_models, quantize_linear_int8, to_device
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+@functools.lru_cache(maxsize=1024)
+def _tokenize(tokenizer, text):
+    """Tokenize one sentence, cached; callers must not modify the tensors."""
+    enc = tokenizer(text, return_tensors='pt')
+    return enc['input_ids'], enc['attention_mask']
+
 class MaskedLanguageModel:
-    def __init__(self, model_name='bert-base-uncased'):
+    def __init__(self, model_name='bert-base-uncased', use_onnx=True, quantize=True, jit=True):
         """Initialize the masked language model."""
         logger.info(f"Loading BERT model: {model_name}")
+        # Per-instance cache of prepared batches; it is dropped with the model and
+        # never serves one tokenizer's encodings to another
+        self._prepare_cached = functools.lru_cache(maxsize=8)(self._prepare)
         
         try:
-            self.tokenizer = AutoTokenizer.from_pretrained(model_name)
-            self.model = AutoModelForMaskedLM.from_pretrained(model_name)
+            # Ask for the Rust tokenizer explicitly; the Python one is several times slower
+            self.tokenizer = AutoTokenizer.from_pretrained(model_name, use_fast=True)
+            if not self.tokenizer.is_fast:
+                logger.warning(f"No fast tokenizer available for {model_name}, using the Python implementation")
+            self.mask_id = self.tokenizer.mask_token_id
+            self.device = 'cuda' if torch.cuda.is_available() else 'cpu'
+            # Half precision on GPU lets the attention and Linear matmuls use tensor cores
+            dtype = torch.float16 if self.device == 'cuda' else torch.float32
+            
+            # ONNX Runtime fuses the attention, LayerNorm and GELU ops of the exported graph
+            self.use_onnx = use_onnx and ONNX_AVAILABLE
+            if self.use_onnx:
+                model = load_onnx_model(ort_models.ORTModelForMaskedLM, model_name, quantize=quantize)
+                self.model = model
+            else:
+                model = AutoModelForMaskedLM.from_pretrained(model_name, torch_dtype=dtype).to(self.device).eval()
+                if quantize:
+                    model = quantize_linear_int8(model)
+                # The direct forwards use the traced graph; the pipeline needs the module itself
+                self.model = self._trace(model) if jit else model
             
-            # Also create a pipeline for easier use
+            # Also create a pipeline for easier use, sharing the loaded tokenizer and weights
             self.fill_mask_pipeline = pipeline(
                 "fill-mask",
-                model=model_name,
-                tokenizer=model_name
+                model=model,
+                tokenizer=self.tokenizer,
+                batch_size=16,
+                device=0 if self.device == 'cuda' else -1
             )
             
+            self._warm_up()
             logger.info("BERT model loaded successfully!")
             
         except Exception as e:
             logger.error(f"Error loading model: {e}")
             raise
     
+    def _warm_up(self):
+        """Run the pipeline and the direct forward once at load time."""
+        sentence = f"The {self.tokenizer.mask_token} test."
+        with torch.inference_mode():
+            self.fill_mask_pipeline(sentence)
+        self.predict_masked_batch([sentence])
+    
+    def _trace(self, model):
+        """Trace the model with TorchScript so forwards skip Python module dispatch."""
+        # The trace is not frozen: freezing would inline a second copy of the weights
+        # as constants, while the unfrozen trace shares the parameters the pipeline uses.
+        # It is traced on the device and dtype the model already lives on and keeps
+        dummy = self.tokenizer(f"The {self.tokenizer.mask_token} test.", return_tensors='pt').to(self.device)
+        with torch.no_grad():
+            return torch.jit.trace(model.eval(), (dummy['input_ids'], dummy['attention_mask']), strict=False)
+    
+    @torch.inference_mode()
     def predict_masked_word(self, masked_sentence, top_k=5):
-        """Predict the masked word in a sentence."""
+        """Predict the masked word in a sentence or a list of sentences."""
+        is_batch = isinstance(masked_sentence, list)
+        try:
+            # Use the pipeline for prediction; a list is batched through its DataLoader
+            if is_batch:
+                results = call_length_sorted(self._fill_mask_batch(top_k), masked_sentence)
+                return [self._format_predictions(sentence_results) for sentence_results in results]
+            results = self.fill_mask_pipeline(masked_sentence, top_k=top_k, tokenizer_kwargs={'truncation': True})
+            return self._format_predictions(results)
+            
+        except Exception as e:
+            logger.error(f"Error in masked word prediction: {e}")
+            return [[] for _ in masked_sentence] if is_batch else []
+    
+    def _fill_mask_batch(self, top_k):
+        """Return a fill-mask pipeline call that truncates long inputs."""
+        def fill(sentences):
+            results = self.fill_mask_pipeline(sentences, top_k=top_k, tokenizer_kwargs={'truncation': True})
+            # The pipeline unwraps single-element lists
+            return [results] if len(sentences) == 1 else results
+        return fill
+    
+    def _format_predictions(self, results):
+        """Convert fill-mask pipeline output for one sentence into prediction dicts."""
+        if results and isinstance(results[0], list):
+            # Several masks: report the predictions for the first one
+            results = results[0]
+        
+        predictions = []
+        for result in results:
+            predictions.append({
+                "predicted_word": result["token_str"],
+                "confidence": result["score"],
+                "complete_sentence": result["sequence"]
+            })
+        
+        return predictions
+    
+    def prepare(self, sentences):
+        """Tokenize sentences once for predict_masked_batch."""
+        return self._prepare_cached(tuple(sentences))
+    
+    def _prepare(self, sentences):
+        """Padded encoding and mask positions of a sentence tuple."""
+        inputs = self.tokenizer(list(sentences), padding=True, truncation=True, return_tensors='pt')
+        
+        # Like the fill-mask pipeline for one mask, predict the first [MASK] in each row;
+        # nonzero() is row-major, so a row's first mask is where the row index changes
+        mask_positions = (inputs['input_ids'] == self.mask_id).nonzero()
+        first = torch.ones(len(mask_positions), dtype=torch.bool)
+        first[1:] = mask_positions[1:, 0] != mask_positions[:-1, 0]
+        rows, cols = mask_positions[first].T.tolist() if first.any() else ([], [])
+        
+        return inputs['input_ids'], inputs['attention_mask'], (rows, cols)
+    
+    def predict_masked_batch(self, sentences, top_k=3, prepared=None, with_sequences=True):
+        """Predict the masked word for several sentences in one forward pass."""
         try:
-            # Use the pipeline for prediction
-            results = self.fill_mask_pipeline(masked_sentence, top_k=top_k)
+            input_ids, attention_mask, (rows, cols) = prepared or self.prepare(sentences)
+            
+            with inference_context(self.device):
+                # Eager, ONNX and traced models all return a mapping with 'logits'
+                logits = self.model(to_device(input_ids, self.device), to_device(attention_mask, self.device))['logits']
             
-            predictions = []
-            for result in results:
-                predictions.append({
-                    "predicted_word": result["token_str"],
-                    "confidence": result["score"],
-                    "complete_sentence": result["sequence"]
-                })
+            top = logits[rows, cols].float().softmax(dim=-1).topk(top_k, dim=-1)
             
-            return predictions
+            batch_predictions = [[] for _ in sentences]
+            for row, entries in zip(rows, self._decode_top(input_ids, rows, cols, top, with_sequences)):
+                for _, score, word, sequence in entries:
+                    prediction = {"predicted_word": word, "confidence": score}
+                    if with_sequences:
+                        prediction["complete_sentence"] = sequence
+                    batch_predictions[row].append(prediction)
+            
+            return batch_predictions
             
         except Exception as e:
-            logger.error(f"Error in masked word prediction: {e}")
-            return []
+            logger.error(f"Error in batched masked word prediction: {e}")
+            return [[] for _ in sentences]
     
+    @torch.inference_mode()
     def predict_multiple_masks(self, sentence_with_masks, top_k=3):
         """Handle sentences with multiple [MASK] tokens."""
         try:
-            # For multiple masks, we'll predict one at a time
-            # This is a simplified approach
-            results = self.fill_mask_pipeline(sentence_with_masks, top_k=top_k)
-            
-            if isinstance(results[0], list):
-                # Multiple masks case
-                return results
-            else:
-                # Single mask case
-                return [results]
-                
+            return self._forward_once(sentence_with_masks, top_k)
         except Exception as e:
             logger.error(f"Error in multiple mask prediction: {e}")
             return []
     
+    def _forward_once(self, sentence, top_k):
+        """Predict every [MASK] in a sentence from one forward pass."""
+        input_ids, attention_mask = _tokenize(self.tokenizer, sentence)
+        mask_pos = (input_ids[0] == self.mask_id).nonzero(as_tuple=True)[0]
+        
+        with inference_context(self.device):
+            logits = self.model(to_device(input_ids, self.device), to_device(attention_mask, self.device))['logits'][0, mask_pos]
+        top = logits.float().softmax(dim=-1).topk(top_k, dim=-1)
+        
+        positions = mask_pos.tolist()
+        return [
+            [
+                {"score": score, "token": token_id, "token_str": word, "sequence": sequence}
+                for token_id, score, word, sequence in entries
+            ]
+            for entries in self._decode_top(input_ids, [0] * len(positions), positions, top)
+        ]
+    
+    def _decode_top(self, input_ids, rows, cols, top, with_sequences=True):
+        """Decode the top-k predictions for each (row, col) mask position."""
+        top_k = top.indices.shape[-1]
+        token_ids = top.indices.cpu().reshape(-1)
+        words = self.tokenizer.batch_decode(token_ids.unsqueeze(1))
+        
+        sequences = itertools.repeat(None)
+        if with_sequences:
+            # Like the pipeline, each sequence fills only its own mask
+            filled = input_ids[rows].repeat_interleave(top_k, dim=0)
+            filled[torch.arange(len(filled)), torch.tensor(cols, dtype=torch.long).repeat_interleave(top_k)] = token_ids
+            sequences = self.tokenizer.batch_decode(filled, skip_special_tokens=True)
+        
+        flat = zip(token_ids.tolist(), top.values.reshape(-1).tolist(), words, sequences)
+        return [list(itertools.islice(flat, top_k)) for _ in rows]
+    
     def interview_context_prediction(self, interview_sentences):
         """Predict masked words in interview-related contexts."""
         predictions = {}
+        batch_results = self.predict_masked_word(list(interview_sentences), top_k=3)
         
-        for sentence in interview_sentences:
-            print(f"\nOriginal: {sentence}")
+        lines = []
+        for sentence, results in zip(interview_sentences, batch_results):
+            lines.append(f"\nOriginal: {sentence}")
             
             try:
-                results = self.predict_masked_word(sentence, top_k=3)
                 predictions[sentence] = results
                 
-                print("Predictions:")
+                lines.append("Predictions:")
                 for i, pred in enumerate(results, 1):
-                    print(f"  {i}. {pred['predicted_word']} (confidence: {pred['confidence']:.3f})")
-                    print(f"     Complete: {pred['complete_sentence']}")
+                    lines.append(f"  {i}. {pred['predicted_word']} (confidence: {format(pred['confidence'], '.3f')})")
+                    lines.append(f"     Complete: {pred['complete_sentence']}")
                 
             except Exception as e:
                 logger.error(f"Error processing sentence: {e}")
                 predictions[sentence] = []
         
+        sys.stdout.write("\n".join(lines) + "\n")
         return predictions
 
 def main():
@@ -113,13 +252,12 @@ def main():
         "During the [MASK] process, we evaluate both technical and soft skills."
     ]
     
-    for sentence in basic_sentences:
-        print(f"\nSentence: {sentence}")
-        predictions = mlm.predict_masked_word(sentence, top_k=3)
-        
-        print("Top predictions:")
-        for i, pred in enumerate(predictions, 1):
-            print(f"  {i}. '{pred['predicted_word']}' (confidence: {pred['confidence']:.3f})")
+    lines = []
+    for sentence, predictions in zip(basic_sentences, mlm.predict_masked_word(basic_sentences, top_k=3)):
+        lines.append(f"\nSentence: {sentence}")
+        lines.append("Top predictions:")
+        lines.extend(f"  {i}. '{pred['predicted_word']}' (confidence: {format(pred['confidence'], '.3f')})" for i, pred in enumerate(predictions, 1))
+    sys.stdout.write("\n".join(lines) + "\n")
     
     print("\n\n2. INTERVIEW-SPECIFIC CONTEXT PREDICTION")
     print("-" * 40)
@@ -147,13 +285,12 @@ def main():
         "The candidate's [MASK] to work under pressure was clearly demonstrated."
     ]
     
-    for sentence in vmis_feedback_sentences:
-        print(f"\nFeedback: {sentence}")
-        predictions = mlm.predict_masked_word(sentence, top_k=5)
-        
-        print("Predictions:")
-        for i, pred in enumerate(predictions, 1):
-            print(f"  {i}. '{pred['predicted_word']}' (score: {pred['confidence']:.3f})")
+    lines = []
+    for sentence, predictions in zip(vmis_feedback_sentences, mlm.predict_masked_word(vmis_feedback_sentences, top_k=5)):
+        lines.append(f"\nFeedback: {sentence}")
+        lines.append("Predictions:")
+        lines.extend(f"  {i}. '{pred['predicted_word']}' (score: {format(pred['confidence'], '.3f')})" for i, pred in enumerate(predictions, 1))
+    sys.stdout.write("\n".join(lines) + "\n")
     
     print("\n\n4. ADVANCED: SENTENCE COMPLETION")
     print("-" * 40)
@@ -165,21 +302,21 @@ def main():
         "The applicant demonstrated [MASK] problem-solving skills and excellent [MASK] abilities."
     ]
     
-    for sentence in complex_sentences:
-        print(f"\nSentence: {sentence}")
+    lines = []
+    for sentence, predictions in zip(complex_sentences, mlm.predict_masked_word(complex_sentences, top_k=2)):
+        lines.append(f"\nSentence: {sentence}")
         
         # Handle multiple masks by processing one at a time
         if sentence.count('[MASK]') > 1:
-            print("(Note: Multiple masks detected - processing sequentially)")
+            lines.append("(Note: Multiple masks detected - processing sequentially)")
         
         try:
-            predictions = mlm.predict_masked_word(sentence, top_k=2)
-            print("Top predictions for first [MASK]:")
-            for i, pred in enumerate(predictions, 1):
-                print(f"  {i}. '{pred['predicted_word']}' -> {pred['complete_sentence']}")
+            lines.append("Top predictions for first [MASK]:")
+            lines.extend(f"  {i}. '{pred['predicted_word']}' -> {pred['complete_sentence']}" for i, pred in enumerate(predictions, 1))
                 
         except Exception as e:
-            print(f"Error processing: {e}")
+            lines.append(f"Error processing: {e}")
+    sys.stdout.write("\n".join(lines) + "\n")
 
 if __name__ == "__main__":
     main()
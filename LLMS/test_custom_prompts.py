@@ -0,0 +1,45 @@
+"""
+Tests for the prompt engine's length bucketing
+Run from the LLMS directory with: python -m unittest test_custom_prompts
+"""
+
+import random
+import unittest
+from unittest import mock
+
+try:
+    import custom_prompts
+    DEPENDENCIES_AVAILABLE = True
+except ImportError:
+    DEPENDENCIES_AVAILABLE = False
+
+@unittest.skipUnless(DEPENDENCIES_AVAILABLE, "torch and transformers are required")
+class LengthBucketsTest(unittest.TestCase):
+    def setUp(self):
+        rng = random.Random(0)
+        self.input_ids = [[0] * rng.randint(0, 120) for _ in range(200)]
+    
+    def test_every_prompt_is_in_exactly_one_bucket(self):
+        buckets = custom_prompts._length_buckets(self.input_ids)
+        self.assertEqual(sorted(i for bucket in buckets for i in bucket), list(range(len(self.input_ids))))
+    
+    def test_buckets_respect_size_and_length_ratio(self):
+        with mock.patch.object(custom_prompts, 'MAX_BATCH_SIZE', 8):
+            buckets = custom_prompts._length_buckets(self.input_ids)
+        for bucket in buckets:
+            lengths = [len(self.input_ids[i]) for i in bucket]
+            self.assertLessEqual(len(bucket), 8)
+            self.assertLessEqual(max(lengths), custom_prompts.MAX_LENGTH_RATIO * max(1, min(lengths)))
+    
+    def test_buckets_are_ordered_by_length(self):
+        lengths = [len(self.input_ids[i]) for bucket in custom_prompts._length_buckets(self.input_ids) for i in bucket]
+        self.assertEqual(lengths, sorted(lengths))
+    
+    def test_equal_lengths_share_a_bucket(self):
+        self.assertEqual(custom_prompts._length_buckets([[1, 2], [3, 4], [5, 6]]), [[0, 1, 2]])
+    
+    def test_empty_input(self):
+        self.assertEqual(custom_prompts._length_buckets([]), [])
+
+if __name__ == "__main__":
+    unittest.main()
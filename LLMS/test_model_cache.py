@@ -0,0 +1,44 @@
+"""
+Tests for the length-sorted pipeline helper
+Run from the LLMS directory with: python -m unittest test_model_cache
+"""
+
+import unittest
+
+try:
+    from _model_cache import call_length_sorted
+    DEPENDENCIES_AVAILABLE = True
+except ImportError:
+    DEPENDENCIES_AVAILABLE = False
+
+@unittest.skipUnless(DEPENDENCIES_AVAILABLE, "torch and transformers are required")
+class CallLengthSortedTest(unittest.TestCase):
+    def test_pipeline_sees_texts_shortest_first(self):
+        seen = []
+        
+        def pipeline(texts):
+            seen.extend(texts)
+            return [len(text) for text in texts]
+        
+        call_length_sorted(pipeline, ["ccc", "a", "bb", "dddd", ""])
+        self.assertEqual(seen, ["", "a", "bb", "ccc", "dddd"])
+    
+    def test_results_come_back_in_input_order(self):
+        texts = ["a long piece of feedback", "short", "medium length", "x"]
+        self.assertEqual(call_length_sorted(lambda batch: [text.upper() for text in batch], texts), [text.upper() for text in texts])
+    
+    def test_equal_lengths_keep_their_order(self):
+        seen = []
+        
+        def pipeline(texts):
+            seen.extend(texts)
+            return texts
+        
+        call_length_sorted(pipeline, ["bb", "aa", "c"])
+        self.assertEqual(seen, ["c", "bb", "aa"])
+    
+    def test_empty_input(self):
+        self.assertEqual(call_length_sorted(lambda batch: [], []), [])
+
+if __name__ == "__main__":
+    unittest.main()
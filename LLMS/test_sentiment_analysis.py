@@ -0,0 +1,115 @@
+"""
+Tests for the Triton-backed sentiment pipeline
+Run from the LLMS directory with: python -m unittest test_sentiment_analysis
+"""
+
+import unittest
+from unittest import mock
+
+try:
+    import numpy as np
+    import sentiment_analysis
+    from sentiment_analysis import SentimentAnalyzer, TritonSentimentPipeline
+    DEPENDENCIES_AVAILABLE = True
+except ImportError:
+    DEPENDENCIES_AVAILABLE = False
+
+SEQUENCE_LENGTH = 8
+ID2LABEL = {0: 'negative', 1: 'neutral', 2: 'positive'}
+
+class FakeInferInput:
+    """Stand-in for grpcclient.InferInput that keeps the array it is given."""
+    
+    def __init__(self, name, shape, datatype):
+        self.name = name
+        self.data = None
+    
+    def set_data_from_numpy(self, data):
+        self.data = data
+
+class FakeResponse:
+    def __init__(self, logits):
+        self.logits = logits
+    
+    def as_numpy(self, name):
+        return self.logits
+
+class FakeClient:
+    """Stand-in Triton client that scores every row as clearly positive."""
+    
+    def __init__(self, url):
+        self.requests = []
+    
+    def infer(self, model_name, inputs, outputs):
+        batch = inputs[0].data.shape[0]
+        self.requests.append(batch)
+        return FakeResponse(np.tile(np.array([[0.1, 0.2, 3.0]], dtype=np.float32), (batch, 1)))
+
+class FakeGrpcClient:
+    InferenceServerClient = FakeClient
+    InferInput = FakeInferInput
+    
+    @staticmethod
+    def InferRequestedOutput(name):
+        return name
+
+def fake_tokenizer(texts, **kwargs):
+    """Return fixed-length encodings shaped like the fast tokenizer's NumPy output."""
+    shape = (len(texts), SEQUENCE_LENGTH)
+    return {'input_ids': np.zeros(shape, dtype=np.int64), 'attention_mask': np.ones(shape, dtype=np.int64)}
+
+@unittest.skipUnless(DEPENDENCIES_AVAILABLE, "numpy, torch and transformers are required")
+class TritonSentimentTest(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(sentiment_analysis, 'grpcclient', FakeGrpcClient, create=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        
+        # Skip model loading; the analyzer only needs its pipeline for these calls
+        self.analyzer = SentimentAnalyzer.__new__(SentimentAnalyzer)
+        self.analyzer.sentiment_pipeline = TritonSentimentPipeline('localhost:8001', 'sentiment_bert', fake_tokenizer, ID2LABEL)
+    
+    def test_single_string_returns_a_one_element_list(self):
+        results = self.analyzer.sentiment_pipeline("Great interview")
+        self.assertIsInstance(results, list)
+        self.assertEqual(len(results), 1)
+    
+    def test_analyze_sentiment(self):
+        result = self.analyzer.analyze_sentiment("The candidate gave clear, thorough answers.")
+        self.assertEqual(result['label'], 'positive')
+        self.assertGreater(result['score'], 0.8)
+    
+    def test_classify_interview_performance(self):
+        classification = self.analyzer.classify_interview_performance("Outstanding technical depth.")
+        self.assertEqual(classification['sentiment'], 'POSITIVE')
+        self.assertEqual(classification['performance_rating'], 'Excellent')
+    
+    def test_list_is_split_into_batches(self):
+        results = self.analyzer.sentiment_pipeline(["a", "b", "c"], batch_size=2)
+        self.assertEqual(len(results), 3)
+        self.assertEqual(self.analyzer.sentiment_pipeline.client.requests, [2, 1])
+
+def failing_pipeline(inputs, batch_size=32, truncation=True):
+    """Read inputs in batches like the pipeline's DataLoader and fail on the third text."""
+    inputs = iter(inputs)
+    while True:
+        batch = [text for _, text in zip(range(batch_size), inputs)]
+        if not batch:
+            return
+        for text in batch:
+            if text == "c":
+                raise RuntimeError("inference failed")
+            yield {"label": "positive", "score": 0.9}
+
+@unittest.skipUnless(DEPENDENCIES_AVAILABLE, "numpy, torch and transformers are required")
+class IterFeedbackTest(unittest.TestCase):
+    def test_every_text_gets_a_row_when_the_pipeline_fails(self):
+        analyzer = SentimentAnalyzer.__new__(SentimentAnalyzer)
+        analyzer.sentiment_pipeline = failing_pipeline
+        
+        results = list(analyzer.iter_feedback(iter("abcde"), batch_size=2))
+        self.assertEqual([result['feedback'] for result in results], list("abcde"))
+        self.assertEqual([result['sentiment'] for result in results], ["positive"] * 2 + ["UNKNOWN"] * 3)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+"""
+Tests for the simple runner's n-gram overlap scoring
+Run from the LLMS directory with: python -m unittest test_simple_runner
+"""
+
+import unittest
+from collections import Counter
+from unittest import mock
+
+try:
+    import numpy as np
+    import simple_runner
+    DEPENDENCIES_AVAILABLE = True
+except ImportError:
+    DEPENDENCIES_AVAILABLE = False
+
+def counted_matches(reference_ids, candidate_ids, n):
+    """Clipped n-gram matches counted the textbook way, with a Counter per side."""
+    def ngrams(ids):
+        ids = list(ids)
+        return Counter(tuple(ids[i:i + n]) for i in range(len(ids) - n + 1))
+    return sum((ngrams(reference_ids) & ngrams(candidate_ids)).values())
+
+@unittest.skipUnless(DEPENDENCIES_AVAILABLE, "numpy is required")
+class NgramMatcherTest(unittest.TestCase):
+    def random_pairs(self, vocab_size, length, count=50):
+        rng = np.random.default_rng(0)
+        for _ in range(count):
+            yield (
+                rng.integers(0, vocab_size, rng.integers(0, length), dtype=np.int32),
+                rng.integers(0, vocab_size, rng.integers(0, length), dtype=np.int32)
+            )
+    
+    def test_matchers_agree_with_counted_matches(self):
+        for reference_ids, candidate_ids in self.random_pairs(vocab_size=6, length=30):
+            for n in range(1, simple_runner.BLEU_MAX_ORDER + 1):
+                expected = counted_matches(reference_ids, candidate_ids, n)
+                self.assertEqual(simple_runner._clipped_ngram_matches_loop(reference_ids, candidate_ids, n), expected)
+                self.assertEqual(simple_runner._clipped_ngram_matches_numpy(reference_ids, candidate_ids, n), expected)
+    
+    def test_large_ids_do_not_collide(self):
+        # Ids far apart in the shared vocabulary are renumbered per pair before keying
+        reference_ids = np.array([0, 2_000_000_000, 7, 0, 2_000_000_000], dtype=np.int32)
+        candidate_ids = np.array([2_000_000_000, 7, 0, 2_000_000_000, 1], dtype=np.int32)
+        for n in range(1, 5):
+            self.assertEqual(
+                simple_runner._clipped_ngram_matches_numpy(reference_ids, candidate_ids, n),
+                counted_matches(reference_ids, candidate_ids, n)
+            )
+    
+    def test_tuple_fallback_when_keys_would_overflow(self):
+        # Every pair uses all 20 ids and 20 ** 16 does not fit in int64, so the windows are counted as tuples
+        rng = np.random.default_rng(0)
+        for _ in range(10):
+            reference_ids = np.concatenate((np.arange(20, dtype=np.int32), rng.integers(0, 20, 40, dtype=np.int32)))
+            candidate_ids = np.concatenate((reference_ids[rng.integers(0, 20):][:30], rng.integers(0, 20, 30, dtype=np.int32)))
+            self.assertEqual(
+                simple_runner._clipped_ngram_matches_numpy(reference_ids, candidate_ids, 16),
+                counted_matches(reference_ids, candidate_ids, 16)
+            )
+    
+    def test_overlap_scores_do_not_depend_on_the_matcher(self):
+        texts = [
+            "Can you explain the difference between Python lists and tuples?",
+            "Please explain how Python lists differ from tuples.",
+            "the cat sat on the mat the cat sat",
+            "the cat sat on the hat"
+        ]
+        token_ids = simple_runner._to_ids(texts)
+        for reference_ids, candidate_ids in zip(token_ids[0::2], token_ids[1::2]):
+            with mock.patch.object(simple_runner, '_clipped_ngram_matches', simple_runner._clipped_ngram_matches_loop):
+                expected = simple_runner._overlap_scores(reference_ids, candidate_ids)
+            with mock.patch.object(simple_runner, '_clipped_ngram_matches', simple_runner._clipped_ngram_matches_numpy):
+                self.assertEqual(simple_runner._overlap_scores(reference_ids, candidate_ids), expected)
+    
+    def test_identical_texts_score_one(self):
+        reference_ids, candidate_ids = simple_runner._to_ids(["the candidate answered every question"] * 2)
+        bleu, rouge1 = simple_runner._overlap_scores(reference_ids, candidate_ids)
+        self.assertAlmostEqual(bleu, 1.0)
+        self.assertAlmostEqual(rouge1, 1.0)
+    
+    def test_empty_candidate_scores_zero(self):
+        reference_ids, candidate_ids = simple_runner._to_ids(["some reference", ""])
+        self.assertEqual(simple_runner._overlap_scores(reference_ids, candidate_ids), (0.0, 0.0))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -4,6 +4,7 @@ This script demonstrates text generation for creating interview questions.
 """
 
 import logging
+import re
 import warnings
 warnings.filterwarnings("ignore")
 
@@ -14,7 +15,8 @@ logger = logging.getLogger(__name__)
 # Try to import transformers with error handling
 try:
     import torch
-    from transformers import GPT2LMHeadModel, GPT2Tokenizer
+    from transformers import GenerationConfig, GPT2LMHeadModel, GPT2Tokenizer
+    from _model_cache import ONNX_AVAILABLE, conv1d_to_linear, inference_context, load_onnx_model, ort_models, quantize_linear_int8, to_device
     TRANSFORMERS_AVAILABLE = True
     logger.info("Transformers library loaded successfully")
 except ImportError as e:
@@ -24,8 +26,28 @@ except Exception as e:
     logger.warning(f"Error loading transformers: {e}")
     TRANSFORMERS_AVAILABLE = False
 
+# Token budget for greedy generation; a fixed new-token count bounds every call's decode loop
+GREEDY_MAX_NEW_TOKENS = 64
+
+def _keyword_pattern(keywords):
+    """Compile keywords into one pattern that finds overlapping matches."""
+    # The lookahead matches without consuming, so a keyword inside another one's match is still found;
+    # IGNORECASE scans the text as given instead of a lowered copy of it
+    return re.compile("(?=(" + "|".join(sorted(keywords, key=len, reverse=True)) + "))", re.IGNORECASE)
+
+# Keywords the mock responses branch on, compiled once at import; only the short
+# matches are lowered, so the branches can test the found set in lower case
+_QUESTION_KEYWORDS = _keyword_pattern([
+    "python", "programming", "teamwork", "team", "problem", "solving", "feedback", "performance", "leadership", "lead"
+])
+_FEEDBACK_KEYWORDS = _keyword_pattern(["strong", "excellent", "poor", "weak", "communication", "lacks"])
+_SUMMARY_KEYWORDS = _keyword_pattern([
+    "technical", "good", "strong", "coding", "well", "problem", "solving", "communication",
+    "clear", "nervous", "presentation", "lacks", "needs", "experience"
+])
+
 class TextGenerator:
-    def __init__(self, model_name='gpt2'):
+    def __init__(self, model_name='gpt2', quantize=None, use_onnx=False):
         """Initialize the text generator with a pre-trained model."""
         if not TRANSFORMERS_AVAILABLE:
             logger.warning("Transformers not available, using mock responses")
@@ -35,10 +57,57 @@ class TextGenerator:
         try:
             logger.info(f"Loading {model_name} model...")
             self.tokenizer = GPT2Tokenizer.from_pretrained(model_name)
-            self.model = GPT2LMHeadModel.from_pretrained(model_name)
+            self.device = 'cuda' if torch.cuda.is_available() else 'cpu'
+            self.use_onnx = use_onnx and ONNX_AVAILABLE
+            bf16_supported = self.device == 'cpu' and getattr(torch.cpu, '_is_avx512_bf16_supported', lambda: False)()
+            # By default CPUs with native bf16 keep the bf16 model and the rest fall back
+            # to INT8; the ONNX export runs in fp32, so it is always quantized on CPU
+            if quantize is None:
+                quantize = self.device == 'cpu' and (self.use_onnx or not bf16_supported)
+            # Half precision halves the weight bandwidth: fp16 on GPU, bf16 on CPUs with
+            # native bf16 dot products, fp32 on older CPUs where bf16 would be emulated.
+            # Dynamic INT8 quantization and the ONNX export take the fp32 weights instead
+            if self.device == 'cuda':
+                self.dtype = torch.float16
+            elif quantize or self.use_onnx:
+                self.dtype = torch.float32
+            elif bf16_supported:
+                self.dtype = torch.bfloat16
+            else:
+                self.dtype = torch.float32
             
-            # Add padding token
+            # The ONNX export keeps the past key/value inputs, so generate() still
+            # decodes one token per step; its graph is fused for the gpt2 model type
+            if self.use_onnx:
+                self.model = load_onnx_model(ort_models.ORTModelForCausalLM, model_name, quantize=quantize, fusion_type='gpt2')
+            else:
+                self.model = GPT2LMHeadModel.from_pretrained(model_name, torch_dtype=self.dtype).to(self.device).eval()
+            if quantize and self.device == 'cpu' and not self.use_onnx:
+                # GPT-2's attention and MLP projections are Conv1D modules, which the
+                # Linear-only quantizer would skip, so they are converted first
+                self.model = quantize_linear_int8(conv1d_to_linear(self.model))
+                logger.info(f"Quantized {model_name} to INT8 ({torch.backends.quantized.engine} engine)")
+            
+            # Add padding token; pad on the left so batched prompts end where generation starts
             self.tokenizer.pad_token = self.tokenizer.eos_token
+            self.tokenizer.padding_side = 'left'
+            # Built once so greedy calls skip re-deriving generation settings per call
+            self.greedy_config = GenerationConfig(
+                do_sample=False,
+                num_beams=1,
+                max_new_tokens=GREEDY_MAX_NEW_TOKENS,
+                use_cache=True,
+                pad_token_id=self.tokenizer.eos_token_id,
+                no_repeat_ngram_size=2
+            )
+            
+            # On GPU, a static KV cache keeps every decode step the same shape, so the
+            # compiled forward replays one CUDA graph per step instead of retracing
+            if self.device == 'cuda' and not self.use_onnx and hasattr(torch, 'compile') and getattr(self.model, '_supports_static_cache', False):
+                self.model.generation_config.cache_implementation = 'static'
+                self.greedy_config.cache_implementation = 'static'
+                self.model.forward = torch.compile(self.model.forward, mode="reduce-overhead", fullgraph=True)
+                logger.info("Compiled the model forward with a static KV cache")
             self.mock_mode = False
             
             logger.info("Model loaded successfully!")
@@ -54,19 +123,10 @@ class TextGenerator:
         
         try:
             # Encode the prompt
-            input_ids = self.tokenizer.encode(prompt, return_tensors='pt')
+            inputs = to_device(self.tokenizer(prompt, return_tensors='pt'), self.device)
             
-            # Generate text
-            with torch.no_grad():
-                outputs = self.model.generate(
-                    input_ids,
-                    max_length=max_length,
-                    num_return_sequences=num_return_sequences,
-                    temperature=temperature,
-                    do_sample=True,
-                    pad_token_id=self.tokenizer.eos_token_id,
-                    no_repeat_ngram_size=2
-                )
+            # Generate text; max_length counts the prompt tokens too
+            outputs = self._generate(inputs, max_length - inputs['input_ids'].shape[1], temperature, num_return_sequences)
             
             # Decode the generated text
             generated_texts = []
@@ -80,6 +140,64 @@ class TextGenerator:
             logger.error(f"Error in text generation: {e}")
             return self._mock_interview_question(prompt)
     
+    def generate_batch(self, prompts, max_length=80, num_return_sequences=1, temperature=0.8, greedy=False):
+        """Generate interview questions for several prompts in one call."""
+        if self.mock_mode:
+            return [self._mock_interview_question(prompt) for prompt in prompts]
+        
+        try:
+            inputs = to_device(self.tokenizer(prompts, padding=True, return_tensors='pt'), self.device)
+            
+            if greedy:
+                # Greedy search yields one sequence per prompt
+                num_return_sequences = 1
+                with inference_context(self.device, self.dtype):
+                    outputs = self.model.generate(**inputs, generation_config=self.greedy_config)
+            else:
+                outputs = self._generate(inputs, max_length - inputs['input_ids'].shape[1], temperature, num_return_sequences)
+            
+            # Sequences come back grouped per prompt, num_return_sequences at a time
+            generated_texts = self.tokenizer.batch_decode(outputs, skip_special_tokens=True)
+            return [
+                generated_texts[i * num_return_sequences:(i + 1) * num_return_sequences]
+                for i in range(len(prompts))
+            ]
+            
+        except Exception as e:
+            logger.error(f"Error in batch text generation: {e}")
+            return [self._mock_interview_question(prompt) for prompt in prompts]
+    
+    def _generate(self, inputs, max_new_tokens, temperature, num_return_sequences=1):
+        """Sample up to max_new_tokens past the prompt with a KV cache."""
+        # The attention mask comes with the tokenizer output, so padding is never attended to
+        with inference_context(self.device, self.dtype):
+            return self.model.generate(
+                **inputs,
+                max_new_tokens=max(max_new_tokens, 1),
+                num_return_sequences=num_return_sequences,
+                temperature=temperature,
+                do_sample=True,
+                use_cache=True,
+                pad_token_id=self.tokenizer.eos_token_id,
+                no_repeat_ngram_size=2
+            )
+    
+    def _generate_continuations(self, prompts, max_new_tokens, temperature):
+        """Sample one continuation per prompt in a single batch."""
+        inputs = to_device(self.tokenizer(prompts, padding=True, return_tensors='pt'), self.device)
+        outputs = self._generate(inputs, max_new_tokens, temperature)
+        
+        # Left padding puts every prompt in the first columns, so the new tokens start at the same offset
+        return [text.strip() for text in self.tokenizer.batch_decode(outputs[:, inputs['input_ids'].shape[1]:], skip_special_tokens=True)]
+    
+    def warmup(self):
+        """Run a short throwaway generation at load time."""
+        if self.mock_mode:
+            return
+        
+        logger.info("Warming up text generator...")
+        self.generate_batch(["warmup"], max_length=8)
+    
     def _mock_interview_question(self, prompt):
         """Generate mock interview questions when model is not available."""
         mock_questions = {
@@ -91,114 +209,89 @@ class TextGenerator:
         }
         
         # Simple keyword matching for mock responses
-        prompt_lower = prompt.lower()
-        if "python" in prompt_lower or "programming" in prompt_lower:
+        found = {match.lower() for match in _QUESTION_KEYWORDS.findall(prompt)}
+        if "python" in found or "programming" in found:
             return [mock_questions["python"]]
-        elif "teamwork" in prompt_lower or "team" in prompt_lower:
+        elif "teamwork" in found or "team" in found:
             return [mock_questions["teamwork"]]
-        elif "problem" in prompt_lower or "solving" in prompt_lower:
+        elif "problem" in found or "solving" in found:
             return [mock_questions["problem"]]
-        elif "feedback" in prompt_lower or "performance" in prompt_lower:
+        elif "feedback" in found or "performance" in found:
             return [mock_questions["feedback"]]
-        elif "leadership" in prompt_lower or "lead" in prompt_lower:
+        elif "leadership" in found or "lead" in found:
             return [mock_questions["leadership"]]
         else:
             return ["What specific experience do you have that makes you qualified for this position?"]
     
     def generate_feedback(self, performance_description, max_length=80):
         """Generate feedback for interview performance."""
-        if self.mock_mode:
-            return self._mock_feedback(performance_description)
-        
-        feedback_prompt = f"Interview feedback for candidate performance: {performance_description}\nFeedback:"
+        descriptions = [performance_description] if isinstance(performance_description, str) else performance_description
         
-        try:
-            input_ids = self.tokenizer.encode(feedback_prompt, return_tensors='pt')
-            
-            with torch.no_grad():
-                outputs = self.model.generate(
-                    input_ids,
-                    max_length=len(input_ids[0]) + max_length,
-                    temperature=0.7,
-                    do_sample=True,
-                    pad_token_id=self.tokenizer.eos_token_id,
-                    no_repeat_ngram_size=2
-                )
-            
-            generated_text = self.tokenizer.decode(outputs[0], skip_special_tokens=True)
-            # Extract only the feedback part
-            feedback = generated_text.replace(feedback_prompt, "").strip()
-            
-            return feedback
+        if self.mock_mode:
+            feedback = [self._mock_feedback(desc) for desc in descriptions]
+        else:
+            feedback_prompts = [f"Interview feedback for candidate performance: {desc}\nFeedback:" for desc in descriptions]
             
-        except Exception as e:
-            logger.error(f"Error in feedback generation: {e}")
-            return self._mock_feedback(performance_description)
+            try:
+                feedback = self._generate_continuations(feedback_prompts, max_length, temperature=0.7)
+            except Exception as e:
+                logger.error(f"Error in feedback generation: {e}")
+                feedback = [self._mock_feedback(desc) for desc in descriptions]
+        
+        return feedback[0] if isinstance(performance_description, str) else feedback
     
     def _mock_feedback(self, performance_description):
         """Generate mock feedback when model is not available."""
-        desc_lower = performance_description.lower()
-        if "strong" in desc_lower or "excellent" in desc_lower:
+        found = {match.lower() for match in _FEEDBACK_KEYWORDS.findall(performance_description)}
+        if "strong" in found or "excellent" in found:
             return "Outstanding performance with excellent technical skills and clear communication."
-        elif "poor" in desc_lower or "weak" in desc_lower:
+        elif "poor" in found or "weak" in found:
             return "Performance needs improvement. Recommend additional training and practice."
-        elif "communication" in desc_lower and "lacks" in desc_lower:
+        elif "communication" in found and "lacks" in found:
             return "Strong technical abilities demonstrated. Needs improvement in communication and presentation skills."
         else:
             return "Solid performance overall with areas for continued development and growth."
     
     def summarize_interview(self, interview_notes, max_length=100):
         """Summarize interview notes into key strengths and weaknesses."""
-        if self.mock_mode:
-            return self._mock_summary(interview_notes)
-        
-        summary_prompt = f"Interview summary - Notes: {interview_notes}\nKey strengths and weaknesses:"
+        notes_list = [interview_notes] if isinstance(interview_notes, str) else interview_notes
         
-        try:
-            input_ids = self.tokenizer.encode(summary_prompt, return_tensors='pt')
-            
-            with torch.no_grad():
-                outputs = self.model.generate(
-                    input_ids,
-                    max_length=len(input_ids[0]) + max_length,
-                    temperature=0.6,
-                    do_sample=True,
-                    pad_token_id=self.tokenizer.eos_token_id,
-                    no_repeat_ngram_size=2
-                )
-            
-            generated_text = self.tokenizer.decode(outputs[0], skip_special_tokens=True)
-            summary = generated_text.replace(summary_prompt, "").strip()
-            
-            return summary
+        if self.mock_mode:
+            summaries = [self._mock_summary(notes) for notes in notes_list]
+        else:
+            summary_prompts = [f"Interview summary - Notes: {notes}\nKey strengths and weaknesses:" for notes in notes_list]
             
-        except Exception as e:
-            logger.error(f"Error in interview summarization: {e}")
-            return self._mock_summary(interview_notes)
+            try:
+                summaries = self._generate_continuations(summary_prompts, max_length, temperature=0.6)
+            except Exception as e:
+                logger.error(f"Error in interview summarization: {e}")
+                summaries = [self._mock_summary(notes) for notes in notes_list]
+        
+        return summaries[0] if isinstance(interview_notes, str) else summaries
     
     def _mock_summary(self, interview_notes):
         """Generate mock summary when model is not available."""
-        notes_lower = interview_notes.lower()
+        found = {match.lower() for match in _SUMMARY_KEYWORDS.findall(interview_notes)}
         strengths = []
         weaknesses = []
         
         # Extract strengths
-        if "technical" in notes_lower and ("good" in notes_lower or "strong" in notes_lower):
+        if "technical" in found and ("good" in found or "strong" in found):
             strengths.append("Strong technical background")
-        if "coding" in notes_lower and ("good" in notes_lower or "well" in notes_lower):
+        if "coding" in found and ("good" in found or "well" in found):
             strengths.append("Good coding skills")
-        if "problem" in notes_lower and "solving" in notes_lower:
+        if "problem" in found and "solving" in found:
             strengths.append("Problem-solving abilities")
-        if "communication" in notes_lower and ("good" in notes_lower or "clear" in notes_lower):
+        if "communication" in found and ("good" in found or "clear" in found):
             strengths.append("Clear communication")
         
         # Extract weaknesses
-        if "nervous" in notes_lower or "presentation" in notes_lower:
+        if "nervous" in found or "presentation" in found:
             weaknesses.append("Presentation skills")
-        if "lacks" in notes_lower or "needs" in notes_lower:
-            if "experience" in notes_lower:
+        if "lacks" in found or "needs" in found:
+            if "experience" in found:
                 weaknesses.append("More experience needed")
-            if "communication" in notes_lower:
+            if "communication" in found:
                 weaknesses.append("Communication skills")
         
         # Default if no specific patterns found
@@ -226,9 +319,10 @@ def main():
     print("1. INTERVIEW QUESTION GENERATION")
     print("-" * 40)
     
-    for i, prompt in enumerate(interview_prompts, 1):
+    # Each section's inputs go through generate() as one padded batch
+    batch_questions = generator.generate_batch(interview_prompts, max_length=80)
+    for i, (prompt, questions) in enumerate(zip(interview_prompts, batch_questions), 1):
         print(f"\nPrompt {i}: {prompt}")
-        questions = generator.generate_interview_question(prompt, max_length=80)
         for j, question in enumerate(questions, 1):
             print(f"Generated Question {j}: {question}\n")
     
@@ -242,9 +336,8 @@ def main():
         "Shows creativity in solutions but needs improvement in technical depth."
     ]
     
-    for desc in performance_descriptions:
+    for desc, feedback in zip(performance_descriptions, generator.generate_feedback(performance_descriptions)):
         print(f"\nPerformance: {desc}")
-        feedback = generator.generate_feedback(desc)
         print(f"Generated Feedback: {feedback}\n")
     
     print("\n3. INTERVIEW SUMMARIZATION")
@@ -257,9 +350,8 @@ def main():
         "Creative problem solver, good team player, needs improvement in time management"
     ]
     
-    for notes in interview_notes:
+    for notes, summary in zip(interview_notes, generator.summarize_interview(interview_notes)):
         print(f"\nInterview Notes: {notes}")
-        summary = generator.summarize_interview(notes)
         print(f"Summary: {summary}\n")
 
 if __name__ == "__main__":
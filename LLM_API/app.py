@@ -1,5 +1,6 @@
-from flask import Flask, request, jsonify
-from llm_integration import generate_text, summarize_text, analyze_sentiment, rate_limit
+import json
+from flask import Flask, Response, request, jsonify, stream_with_context
+from llm_integration import generate_text, stream_generate_text, summarize_text, analyze_sentiment, rate_limit
 
 app = Flask(__name__)
 
@@ -33,5 +34,22 @@ def llm_tasks():
         
     return jsonify(result)
 
+@app.route('/api/llm_tasks/stream', methods=['POST'])
+def llm_tasks_stream():
+    data = request.get_json()
+    
+    if not data or 'prompt' not in data or 'user_id' not in data:
+        return jsonify({"error": "Invalid input"}), 400
+        
+    if rate_limit(data['user_id']):
+        return jsonify({"error": "Rate limit exceeded"}), 429
+        
+    # Each event is sent as soon as the model produces it, as a server-sent event
+    def events():
+        for event in stream_generate_text(data['prompt']):
+            yield f"data: {json.dumps(event)}\n\n"
+    
+    return Response(stream_with_context(events()), mimetype='text/event-stream')
+
 if __name__ == '__main__':
     app.run(debug=True)
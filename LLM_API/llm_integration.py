@@ -1,7 +1,12 @@
 import os
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import json
+import hashlib
 import time
+import threading
+from collections import OrderedDict, deque
 from functools import wraps
 from dotenv import load_dotenv
 
@@ -15,13 +20,34 @@ MODEL_ID = "models/gemini-2.5-flash"
 # Use the v1beta endpoint and the generateContent method (per docs)
 BASE_URL = "https://generativelanguage.googleapis.com/v1beta"
 
-# Caching dictionary
-cache = {}
+# One pooled session reuses TCP+TLS connections across calls and retries transient
+# failures; POST is retried too since generateContent has no side effects, and the
+# last response is returned rather than raised so the status check below reports it
+session = requests.Session()
+session.mount("https://", HTTPAdapter(
+    pool_connections=10,
+    pool_maxsize=10,
+    max_retries=Retry(
+        total=2,
+        backoff_factor=0.3,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=frozenset(["POST"]),
+        raise_on_status=False,
+    ),
+))
 
-# Rate limiting dictionary
-user_requests = {}
+# Response cache keyed by a BLAKE2b digest of the request; least recently used entries go first
+cache = OrderedDict()
+cache_lock = threading.Lock()
+MAX_CACHE = 1024
+
+# Rate limiting: each user keeps only their last REQUEST_LIMIT request times,
+# and the least recently seen users are dropped once MAX_TRACKED_USERS is reached
+user_requests = OrderedDict()
+user_requests_lock = threading.Lock()
 REQUEST_LIMIT = 10  # requests per minute
 TIME_WINDOW = 60  # seconds
+MAX_TRACKED_USERS = 10000
 
 
 def log_error(error_message):
@@ -30,25 +56,51 @@ def log_error(error_message):
 
 
 def rate_limit(user_id):
-    if user_id not in user_requests:
-        user_requests[user_id] = []
-
     current_time = time.time()
-    # Remove requests outside the time window
-    user_requests[user_id] = [req_time for req_time in user_requests[user_id] if current_time - req_time < TIME_WINDOW]
+    with user_requests_lock:
+        timestamps = user_requests.get(user_id)
+        if timestamps is None:
+            timestamps = user_requests[user_id] = deque(maxlen=REQUEST_LIMIT)
+            # Forget the least recently seen user to keep memory bounded
+            if len(user_requests) > MAX_TRACKED_USERS:
+                user_requests.popitem(last=False)
+        else:
+            user_requests.move_to_end(user_id)
+
+        # The oldest of the last REQUEST_LIMIT requests decides whether the window is full
+        if len(timestamps) == REQUEST_LIMIT and current_time - timestamps[0] < TIME_WINDOW:
+            return True  # Rate limit exceeded
+
+        timestamps.append(current_time)
+        return False
+
+
+def _cache_key(method, model_id, payload):
+    # Compact, key-sorted JSON gives the same bytes for equal payloads; only the 16-byte digest is kept
+    payload_bytes = json.dumps(payload, sort_keys=True, separators=(',', ':')).encode('utf-8')
+    return hashlib.blake2b(f"{method}\0{model_id}\0".encode('utf-8') + payload_bytes, digest_size=16).digest()
+
 
-    if len(user_requests[user_id]) >= REQUEST_LIMIT:
-        return True  # Rate limit exceeded
+def _cache_get(cache_key):
+    with cache_lock:
+        if cache_key in cache:
+            cache.move_to_end(cache_key)
+            return cache[cache_key]
+    return None
 
-    user_requests[user_id].append(current_time)
-    return False
+
+def _cache_put(cache_key, value):
+    with cache_lock:
+        cache[cache_key] = value
+        if len(cache) > MAX_CACHE:
+            cache.popitem(last=False)
 
 
 def query(payload, model_id=MODEL_ID):
-    # Simple cache key
-    cache_key = (model_id, json.dumps(payload, sort_keys=True))
-    if cache_key in cache:
-        return cache[cache_key]
+    cache_key = _cache_key("generateContent", model_id, payload)
+    cached = _cache_get(cache_key)
+    if cached is not None:
+        return cached
 
     if not GOOGLE_API_KEY:
         error_message = "Google API key is missing. Please set GOOGLE_API_KEY in your environment or .env file."
@@ -60,7 +112,7 @@ def query(payload, model_id=MODEL_ID):
     headers = {"X-goog-api-key": GOOGLE_API_KEY, "Content-Type": "application/json"}
 
     try:
-        resp = requests.post(url, headers=headers, json=payload, timeout=30)
+        resp = session.post(url, headers=headers, json=payload, timeout=30)
         # If the API responds with non-2xx, capture the body for debugging
         if resp.status_code < 200 or resp.status_code >= 300:
             body_text = resp.text
@@ -70,7 +122,7 @@ def query(payload, model_id=MODEL_ID):
         result = resp.json()
 
         # Cache the result
-        cache[cache_key] = result
+        _cache_put(cache_key, result)
         return result
 
     except requests.exceptions.RequestException as e:
@@ -137,6 +189,74 @@ def generate_text(prompt, temperature=0.2, max_output_tokens=256):
     return {"generated_text": generated}
 
 
+def _chunk_text(chunk):
+    # Each streamed chunk carries the next text delta in candidates -> content -> parts
+    candidates = chunk.get("candidates") or [{}]
+    parts = candidates[0].get("content", {}).get("parts", [])
+    return "".join(part.get("text", "") for part in parts)
+
+
+def stream_generate_text(prompt, model_id=MODEL_ID):
+    # Yields {"text": delta} events as streamGenerateContent produces them, then a final
+    # {"done": True, ...} event with the first-token and total latency; errors yield {"error": ...}
+    payload = {"contents": [{"parts": [{"text": prompt}]}]}
+    cache_key = _cache_key("streamGenerateContent", model_id, payload)
+    start = time.perf_counter()
+
+    # Only the final concatenated text is cached; a hit is replayed as a single delta
+    cached = _cache_get(cache_key)
+    if cached is not None:
+        yield {"text": cached}
+        elapsed = time.perf_counter() - start
+        yield {"done": True, "cached": True, "first_token_seconds": elapsed, "total_seconds": elapsed}
+        return
+
+    if not GOOGLE_API_KEY:
+        error_message = "Google API key is missing. Please set GOOGLE_API_KEY in your environment or .env file."
+        log_error(error_message)
+        yield {"error": error_message}
+        return
+
+    # alt=sse makes the API send one "data: <json>" line per chunk
+    url = f"{BASE_URL}/{model_id}:streamGenerateContent?alt=sse"
+    headers = {"X-goog-api-key": GOOGLE_API_KEY, "Content-Type": "application/json"}
+    deltas = []
+    first_token_seconds = None
+
+    try:
+        with session.post(url, headers=headers, json=payload, timeout=30, stream=True) as resp:
+            if resp.status_code < 200 or resp.status_code >= 300:
+                error_message = f"API error: status={resp.status_code}, body={resp.text}"
+                log_error(error_message)
+                yield {"error": error_message}
+                return
+            # SSE is UTF-8, but without a charset in the header requests would decode it as ISO-8859-1
+            resp.encoding = "utf-8"
+            for line in resp.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data:"):
+                    continue
+                delta = _chunk_text(json.loads(line[len("data:"):]))
+                if not delta:
+                    continue
+                if first_token_seconds is None:
+                    first_token_seconds = time.perf_counter() - start
+                deltas.append(delta)
+                yield {"text": delta}
+    except requests.exceptions.RequestException as e:
+        error_message = f"Network error or API timeout while streaming: {e}"
+        log_error(error_message)
+        yield {"error": error_message}
+        return
+    except Exception as e:
+        error_message = f"An unexpected error occurred while streaming: {e}"
+        log_error(error_message)
+        yield {"error": error_message}
+        return
+
+    _cache_put(cache_key, "".join(deltas))
+    yield {"done": True, "cached": False, "first_token_seconds": first_token_seconds, "total_seconds": time.perf_counter() - start}
+
+
 def summarize_text(text, max_output_tokens=150):
     instruction = f"Summarize the following feedback into concise bullet points:\n\n{text}"
     payload = {"contents": [{"parts": [{"text": instruction}]}]}
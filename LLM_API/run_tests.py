@@ -1,4 +1,4 @@
-import time
+import asyncio
 from datetime import datetime
 from dotenv import load_dotenv
 import os
@@ -8,6 +8,8 @@ load_dotenv()
 from llm_integration import generate_text, summarize_text, analyze_sentiment
 
 OUTFILE = 'api_test_results.txt'
+# Tests in flight at once; the shared session retries 429s with backoff
+MAX_CONCURRENT_TESTS = 5
 
 TESTS = [
     {
@@ -64,6 +66,18 @@ def run_test(test):
     return out
 
 
+async def run_all(tests):
+    # The API calls are blocking, so each runs on a worker thread and their network waits overlap
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_TESTS)
+
+    async def run_one(test):
+        async with semaphore:
+            print(f"Running: {test['name']}")
+            return await asyncio.to_thread(run_test, test)
+
+    return await asyncio.gather(*(run_one(test) for test in tests))
+
+
 def append_result(name, test_input, output, observation):
     ts = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S UTC')
     with open(OUTFILE, 'a', encoding='utf-8') as f:
@@ -78,9 +92,9 @@ def append_result(name, test_input, output, observation):
 if __name__ == '__main__':
     print('Running LLM API tests...')
     summary = []
-    for test in TESTS:
-        print(f"Running: {test['name']}")
-        result = run_test(test)
+    results = asyncio.run(run_all(TESTS))
+    # results come back in TESTS order, so the file order matches the list
+    for test, result in zip(TESTS, results):
         # create a short observation
         if isinstance(result, dict) and 'error' in result:
             obs = f"Error: {result['error']}"
@@ -88,8 +102,6 @@ if __name__ == '__main__':
             obs = 'Success'
         append_result(test['name'], test['input'], result, obs)
         summary.append((test['name'], obs))
-        # small delay to avoid rapid-fire
-        time.sleep(1)
 
     print('\nTest Summary:')
     for name, obs in summary:
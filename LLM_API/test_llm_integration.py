@@ -0,0 +1,93 @@
+"""
+Tests for the request bookkeeping in llm_integration
+Run from the LLM_API directory with: python -m unittest test_llm_integration
+"""
+
+import unittest
+from unittest import mock
+
+try:
+    import llm_integration
+    DEPENDENCIES_AVAILABLE = True
+except ImportError:
+    DEPENDENCIES_AVAILABLE = False
+
+
+@unittest.skipUnless(DEPENDENCIES_AVAILABLE, "requests and python-dotenv are required")
+class RateLimitTest(unittest.TestCase):
+    def setUp(self):
+        llm_integration.user_requests.clear()
+        self.addCleanup(llm_integration.user_requests.clear)
+
+    def rate_limit_at(self, user_id, now):
+        with mock.patch.object(llm_integration.time, "time", return_value=now):
+            return llm_integration.rate_limit(user_id)
+
+    def test_limit_applies_inside_the_window(self):
+        for _ in range(llm_integration.REQUEST_LIMIT):
+            self.assertFalse(self.rate_limit_at("alice", 1000.0))
+        self.assertTrue(self.rate_limit_at("alice", 1000.0))
+
+    def test_window_boundary(self):
+        for _ in range(llm_integration.REQUEST_LIMIT):
+            self.rate_limit_at("alice", 1000.0)
+        # The window is half-open: a request exactly TIME_WINDOW later is allowed again
+        self.assertTrue(self.rate_limit_at("alice", 1000.0 + llm_integration.TIME_WINDOW - 0.001))
+        self.assertFalse(self.rate_limit_at("alice", 1000.0 + llm_integration.TIME_WINDOW))
+
+    def test_rejected_requests_are_not_recorded(self):
+        for _ in range(llm_integration.REQUEST_LIMIT + 5):
+            self.rate_limit_at("alice", 1000.0)
+        self.assertEqual(len(llm_integration.user_requests["alice"]), llm_integration.REQUEST_LIMIT)
+
+    def test_users_are_limited_separately(self):
+        for _ in range(llm_integration.REQUEST_LIMIT):
+            self.rate_limit_at("alice", 1000.0)
+        self.assertFalse(self.rate_limit_at("bob", 1000.0))
+
+    def test_least_recently_seen_user_is_evicted(self):
+        with mock.patch.object(llm_integration, "MAX_TRACKED_USERS", 2):
+            self.rate_limit_at("alice", 1000.0)
+            self.rate_limit_at("bob", 1001.0)
+            self.rate_limit_at("alice", 1002.0)
+            self.rate_limit_at("carol", 1003.0)
+        self.assertEqual(list(llm_integration.user_requests), ["alice", "carol"])
+
+
+@unittest.skipUnless(DEPENDENCIES_AVAILABLE, "requests and python-dotenv are required")
+class ResponseCacheTest(unittest.TestCase):
+    def setUp(self):
+        llm_integration.cache.clear()
+        self.addCleanup(llm_integration.cache.clear)
+
+    def test_cache_key_ignores_payload_key_order(self):
+        first = llm_integration._cache_key("generateContent", "models/a", {"x": 1, "y": [1, 2]})
+        second = llm_integration._cache_key("generateContent", "models/a", {"y": [1, 2], "x": 1})
+        self.assertEqual(first, second)
+        self.assertEqual(len(first), 16)
+
+    def test_cache_key_separates_method_and_model(self):
+        payload = {"x": 1}
+        keys = {
+            llm_integration._cache_key("generateContent", "models/a", payload),
+            llm_integration._cache_key("generateContent", "models/b", payload),
+            llm_integration._cache_key("streamGenerateContent", "models/a", payload),
+        }
+        self.assertEqual(len(keys), 3)
+
+    def test_miss_returns_none(self):
+        self.assertIsNone(llm_integration._cache_get(b"missing"))
+
+    def test_least_recently_used_entry_is_evicted(self):
+        with mock.patch.object(llm_integration, "MAX_CACHE", 2):
+            llm_integration._cache_put(b"first", {"n": 1})
+            llm_integration._cache_put(b"second", {"n": 2})
+            # Reading first makes second the least recently used entry
+            self.assertEqual(llm_integration._cache_get(b"first"), {"n": 1})
+            llm_integration._cache_put(b"third", {"n": 3})
+        self.assertIsNone(llm_integration._cache_get(b"second"))
+        self.assertEqual(list(llm_integration.cache), [b"first", b"third"])
+
+
+if __name__ == "__main__":
+    unittest.main()